@@ -0,0 +1,271 @@
+"""
+ALPHABETS.PY
+Literal/length and distance alphabets for the deflate token stream.
+"""
+
+import heapq
+
+from algorithms.errors import CorruptDataError
+
+MIN_MATCH = 3
+END_OF_BLOCK = 256
+MAX_CODE_BITS = 15
+# literal/length symbols: 0-255 literals, 256 end of block, then one symbol
+# per length bucket (lengths up to 2 ** 32); distance buckets cover 2 ** 40
+LITLEN_SIZE = 257 + 64
+DIST_SIZE = 80
+
+
+def bucket(value: int) -> tuple[int, int, int]:
+    """Splits value into a symbol and extra bits, as DEFLATE does for distances.
+        Parameters:
+        value – Non-negative integer.
+        Returns:
+        (symbol, number of extra bits, extra bits). Symbols 0-3 are exact,
+        after that every two symbols double the range they cover.
+    """
+    if value < 4:
+        return value, 0, 0
+    extra = value.bit_length() - 2
+    return 2 * extra + 2 + ((value >> extra) & 1), extra, value & ((1 << extra) - 1)
+
+
+def bucket_base(symbol: int) -> tuple[int, int]:
+    """Returns the first value of the symbol's bucket and its number of extra bits."""
+    if symbol < 4:
+        return symbol, 0
+    extra = (symbol - 2) >> 1
+    return (2 | (symbol & 1)) << extra, extra
+
+
+def token_symbols(tokens: list[int | tuple[int, int]]) -> tuple[list[int], list[int]]:
+    """Counts how often every literal/length and distance symbol occurs.
+        Returns:
+        The literal/length and the distance frequencies, end of block included.
+    """
+    litlen = [0] * LITLEN_SIZE
+    dist = [0] * DIST_SIZE
+    for token in tokens:
+        if isinstance(token, tuple):
+            litlen[257 + bucket(token[1] - MIN_MATCH)[0]] += 1
+            dist[bucket(token[0] - 1)[0]] += 1
+        else:
+            litlen[token] += 1
+    litlen[END_OF_BLOCK] += 1
+    return litlen, dist
+
+
+def code_lengths(freqs: list[int], max_bits: int = MAX_CODE_BITS) -> list[int]:
+    """Builds Huffman code lengths that are no longer than max_bits.
+        Parameters:
+        freqs – Frequency of every symbol; symbols with 0 get no code.
+        max_bits – Longest allowed code.
+        Returns:
+        The code length of every symbol. When a code gets too long the
+        frequencies are halved (keeping them above zero) and the tree is rebuilt.
+    """
+    lengths = [0] * len(freqs)
+    used = [symbol for symbol, freq in enumerate(freqs) if freq]
+    if len(used) == 1:
+        lengths[used[0]] = 1
+    if len(used) < 2:
+        return lengths
+    while True:
+        heap = [(freqs[symbol], symbol, [symbol]) for symbol in used]
+        heapq.heapify(heap)
+        order = len(freqs)
+        while len(heap) > 1:
+            freq1, _, symbols1 = heapq.heappop(heap)
+            freq2, _, symbols2 = heapq.heappop(heap)
+            for symbol in symbols1:
+                lengths[symbol] += 1
+            for symbol in symbols2:
+                lengths[symbol] += 1
+            heapq.heappush(heap, (freq1 + freq2, order, symbols1 + symbols2))
+            order += 1
+        if max(lengths) <= max_bits:
+            return lengths
+        freqs = [(freq >> 1) | 1 if freq else 0 for freq in freqs]
+        lengths = [0] * len(freqs)
+
+
+def pack_lengths(lengths: list[int]) -> bytes:
+    """Packs code lengths (at most 15) two per byte, dropping trailing zeros."""
+    lengths = list(lengths)
+    while lengths and not lengths[-1]:
+        lengths.pop()
+    if len(lengths) % 2:
+        lengths.append(0)
+    return bytes((lengths[i] << 4) | lengths[i + 1] for i in range(0, len(lengths), 2))
+
+
+def unpack_lengths(packed: bytes) -> list[int]:
+    """Restores code lengths packed by pack_lengths."""
+    lengths = []
+    for byte in packed:
+        lengths.append(byte >> 4)
+        lengths.append(byte & 15)
+    return lengths
+
+
+def canonical_codes(lengths: list[int]) -> list[str]:
+    """Assigns canonical Huffman codes to code lengths.
+        Returns:
+        The code of every symbol as a bit string ('' for symbols without a code).
+    """
+    codes = [''] * len(lengths)
+    code = 0
+    previous = 0
+    for length, symbol in sorted((length, symbol) for symbol, length in enumerate(lengths) if length):
+        code <<= length - previous
+        codes[symbol] = format(code, f'0{length}b')
+        code += 1
+        previous = length
+    return codes
+
+
+def check_lengths(lengths: list[int], size: int) -> None:
+    """Checks that code lengths read from a header can form a prefix code.
+        Parameters:
+        lengths – Code lengths of the alphabet.
+        size – Number of symbols in the alphabet.
+        Raises CorruptDataError for codes past the alphabet, lengths over
+        MAX_CODE_BITS and over-subscribed lengths (which would overlap in decode_table).
+    """
+    if any(lengths[size:]) or any(not 0 <= length <= MAX_CODE_BITS for length in lengths):
+        raise CorruptDataError("Code lengths do not fit the alphabet")
+    if sum(1 << (MAX_CODE_BITS - length) for length in lengths if length) > 1 << MAX_CODE_BITS:
+        raise CorruptDataError("Code lengths are over-subscribed")
+
+
+def decode_table(lengths: list[int]) -> list[int]:
+    """Builds a lookup table indexed by the next MAX_CODE_BITS bits of the stream.
+        Returns:
+        A list whose entries are (symbol << 4) | code length,
+        0 where no code starts with those bits.
+    """
+    table = [0] * (1 << MAX_CODE_BITS)
+    for symbol, code in enumerate(canonical_codes(lengths)):
+        if code:
+            span = 1 << (MAX_CODE_BITS - len(code))
+            start = int(code, 2) * span
+            table[start:start + span] = [(symbol << 4) | len(code)] * span
+    return table
+
+
+def encode_tokens(tokens: list[int | tuple[int, int]], litlen_lengths: list[int],
+                  dist_lengths: list[int]) -> tuple[bytes, int]:
+    """Entropy-codes LZ77 tokens with the two code tables.
+        Parameters:
+        tokens – Literals and (distance, length) matches.
+        litlen_lengths – Code lengths of the literal/length alphabet.
+        dist_lengths – Code lengths of the distance alphabet.
+        Returns:
+        The packed bits, ended by the end of block symbol, and the number
+        of padding bits in the last byte.
+        Bits go through an integer bit buffer whose whole bytes are flushed
+        once it holds 64 bits, like decode_tokens reads them.
+    """
+    litlen_codes = [(int(code or '0', 2), len(code)) for code in canonical_codes(litlen_lengths)]
+    dist_codes = [(int(code or '0', 2), len(code)) for code in canonical_codes(dist_lengths)]
+    out = bytearray()
+    acc = 0
+    nbits = 0
+    for token in tokens:
+        if isinstance(token, tuple):
+            dist, length = token
+            symbol, extra, value = bucket(length - MIN_MATCH)
+            code, width = litlen_codes[257 + symbol]
+            acc = (((acc << width) | code) << extra) | value
+            nbits += width + extra
+            symbol, extra, value = bucket(dist - 1)
+            code, width = dist_codes[symbol]
+            acc = (((acc << width) | code) << extra) | value
+            nbits += width + extra
+        else:
+            code, width = litlen_codes[token]
+            acc = (acc << width) | code
+            nbits += width
+        if nbits >= 64:
+            full = nbits >> 3 << 3
+            nbits -= full
+            out += (acc >> nbits).to_bytes(full >> 3, 'big')
+            acc &= (1 << nbits) - 1
+    code, width = litlen_codes[END_OF_BLOCK]
+    acc = (acc << width) | code
+    nbits += width
+    padding = -nbits % 8
+    out += (acc << padding).to_bytes((nbits + padding) // 8, 'big')
+    return bytes(out), padding
+
+
+def decode_tokens(data: bytes, litlen_lengths: list[int],
+                  dist_lengths: list[int]) -> list[int | tuple[int, int]]:
+    """Decodes tokens made by encode_tokens, up to the end of block symbol.
+        Parameters:
+        data – The packed bits.
+        litlen_lengths – Code lengths of the literal/length alphabet.
+        dist_lengths – Code lengths of the distance alphabet.
+        Returns:
+        Literals and (distance, length) matches.
+        Bits are consumed from an integer bit buffer; codes are looked up
+        MAX_CODE_BITS bits at a time.
+        Raises CorruptDataError on invalid codes or a missing end of block.
+    """
+    check_lengths(litlen_lengths, LITLEN_SIZE)
+    check_lengths(dist_lengths, DIST_SIZE)
+    litlen_table = decode_table(litlen_lengths)
+    dist_table = decode_table(dist_lengths)
+    peek = MAX_CODE_BITS
+    peek_mask = (1 << peek) - 1
+    tokens = []
+    n = len(data)
+    pos = 0
+    acc = 0
+    nbits = 0
+    while True:
+        while nbits < peek:
+            acc = (acc << 8) | (data[pos] if pos < n else 0)
+            pos += 1
+            nbits += 8
+        if pos > n + 2:
+            raise CorruptDataError("Token stream ended without an end of block code")
+        entry = litlen_table[(acc >> (nbits - peek)) & peek_mask]
+        if not entry & 15:
+            raise CorruptDataError("Invalid literal/length code")
+        nbits -= entry & 15
+        acc &= (1 << nbits) - 1
+        symbol = entry >> 4
+        if symbol < END_OF_BLOCK:
+            tokens.append(symbol)
+            continue
+        if symbol == END_OF_BLOCK:
+            return tokens
+        length, extra = bucket_base(symbol - 257)
+        if extra:
+            while nbits < extra:
+                acc = (acc << 8) | (data[pos] if pos < n else 0)
+                pos += 1
+                nbits += 8
+            nbits -= extra
+            length += acc >> nbits
+            acc &= (1 << nbits) - 1
+        while nbits < peek:
+            acc = (acc << 8) | (data[pos] if pos < n else 0)
+            pos += 1
+            nbits += 8
+        entry = dist_table[(acc >> (nbits - peek)) & peek_mask]
+        if not entry & 15:
+            raise CorruptDataError("Invalid distance code")
+        nbits -= entry & 15
+        acc &= (1 << nbits) - 1
+        dist, extra = bucket_base(entry >> 4)
+        if extra:
+            while nbits < extra:
+                acc = (acc << 8) | (data[pos] if pos < n else 0)
+                pos += 1
+                nbits += 8
+            nbits -= extra
+            dist += acc >> nbits
+            acc &= (1 << nbits) - 1
+        tokens.append((dist + 1, length + MIN_MATCH))
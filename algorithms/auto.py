@@ -0,0 +1,128 @@
+"""
+AUTO.PY
+Picks a compression algorithm by compressing sampled blocks of the input.
+The codecs are imported by the samplers, so the CLI can import this module
+for its choices without loading them.
+"""
+
+import os
+import pickle
+from time import perf_counter
+
+ALGORITHMS = ["huffman", "deflate", "lzw", "lz77"]
+OBJECTIVES = ["ratio", "speed", "budget"]
+
+
+def _huffman_size(data: bytes) -> int:
+    """Size of the huffman output for data: packed bits plus the code table."""
+    from algorithms.huffman import build_frequency_dict, build_huffman_tree, build_codes
+    codes = build_codes(build_huffman_tree(build_frequency_dict(data)))
+    bit_length = sum(len(codes[byte]) for byte in data)
+    return (bit_length + 7) // 8 + len(pickle.dumps(codes))
+
+
+def _deflate_size(data: bytes) -> int:
+    """Size of the deflate output for data at the fastest level."""
+    from algorithms.deflate import deflate_bytes
+    return len(deflate_bytes(data, level=1))
+
+
+def _lzw_size(data: bytes) -> int:
+    """Size of the pickled lzw codes, as saved by the CLI."""
+    from algorithms.lzw import lzw_encode
+    return len(pickle.dumps(lzw_encode(data)))
+
+
+def _lz77_size(data: bytes) -> int:
+    """Size of the pickled lz77 triples, as saved by the CLI."""
+    from algorithms.lz77 import lz77_compress
+    return len(pickle.dumps(lz77_compress(data)))
+
+
+SAMPLERS = {
+    "huffman": _huffman_size,
+    "deflate": _deflate_size,
+    "lzw": _lzw_size,
+    "lz77": _lz77_size,
+}
+
+
+def sample_blocks(data: bytes, block_size: int = 4096, count: int = 4) -> list[bytes]:
+    """Takes count blocks of block_size bytes spread evenly over data.
+        Parameters:
+        data – Bytes to sample.
+        block_size – Size of every block.
+        count – Number of blocks.
+        Returns:
+        A list of blocks. Small inputs are returned as a single block.
+    """
+    if len(data) <= block_size * count:
+        return [data] if data else []
+    step = (len(data) - block_size) // (count - 1) if count > 1 else 0
+    return [data[i * step:i * step + block_size] for i in range(count)]
+
+
+def estimate_algorithms(data: bytes, block_size: int = 4096, count: int = 4) -> dict[str, dict]:
+    """Compresses sampled blocks with every algorithm.
+        Parameters:
+        data – Bytes to estimate on.
+        block_size – Size of every sampled block.
+        count – Number of sampled blocks.
+        Returns:
+        A dictionary mapping each algorithm to its estimated 'ratio'
+        and 'throughput' (bytes per second).
+    """
+    blocks = sample_blocks(data, block_size, count)
+    sampled = sum(len(block) for block in blocks)
+    estimates = {}
+    for name, sampler in SAMPLERS.items():
+        start = perf_counter()
+        compressed = sum(sampler(block) for block in blocks)
+        elapsed = perf_counter() - start
+        estimates[name] = {
+            'ratio': sampled / compressed if compressed else 0.0,
+            'throughput': sampled / elapsed if elapsed else float('inf'),
+        }
+    return estimates
+
+
+def choose_algorithm(data: bytes, objective: str = "ratio", time_budget: float | None = None,
+                     estimates: dict[str, dict] | None = None) -> str:
+    """Chooses the best algorithm for data.
+        Parameters:
+        data – Bytes that are going to be compressed.
+        objective – 'ratio' for the best ratio, 'speed' for the best throughput,
+        'budget' for the best ratio that fits in time_budget seconds.
+        time_budget – Seconds allowed for the whole input (only for 'budget').
+        estimates – Precomputed result of estimate_algorithms.
+        Returns:
+        The name of the chosen algorithm.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    if estimates is None:
+        estimates = estimate_algorithms(data)
+
+    def fastest():
+        return max(estimates, key=lambda name: estimates[name]['throughput'])
+
+    if objective == "speed":
+        return fastest()
+    if objective == "budget":
+        if time_budget is None:
+            raise ValueError("The 'budget' objective needs a time budget")
+        fitting = [name for name in estimates
+                   if len(data) / estimates[name]['throughput'] <= time_budget]
+        if not fitting:
+            return fastest()
+        return max(fitting, key=lambda name: estimates[name]['ratio'])
+    return max(estimates, key=lambda name: estimates[name]['ratio'])
+
+
+def algorithm_from_filename(path: str) -> str | None:
+    """Guesses the algorithm from a '<name>_<algorithm>_compressed.bin' path."""
+    name = os.path.basename(path)
+    for algorithm in ALGORITHMS:
+        if f"_{algorithm}_compressed" in name:
+            return algorithm
+    return None
@@ -0,0 +1,120 @@
+"""
+CACHE.PY
+On-disk content-addressed cache of compressed files.
+"""
+
+import hashlib
+import os
+import shutil
+
+from algorithms.levels import DEFAULT_LEVEL
+
+CACHE_VERSION = 4
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "apexconvert")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_variant(algorithm: str, filepath: str, level: int = DEFAULT_LEVEL, long_range: bool = False,
+                  entropy: str = "huffman", order: int = 0, stream: bool = False) -> str:
+    """Builds the level part of the cache key from every option that changes the output.
+        Parameters:
+        algorithm – Name of the algorithm.
+        filepath – Path of the input; Huffman stores its file name in the output.
+        level, long_range, entropy, order, stream – The compression options.
+        Returns:
+        A string that is the same for every front end given the same options.
+    """
+    variant = f"{level}{'-long' if long_range else ''}"
+    if entropy != "huffman":
+        variant += f"-{entropy}{order}"
+    if stream:
+        variant += "-stream"
+    if algorithm == "huffman":
+        variant += f"-{os.path.basename(filepath)}"
+    return variant
+
+
+class CompressionCache:
+    """Stores compressed files by the hash of their input, evicting the
+    least recently used entries once the cache grows over max_bytes.
+    """
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, data: bytes, algorithm: str, level: int | str = 0,
+            dictionary_id: int | None = None) -> str:
+        """Builds the cache key of data compressed by algorithm at level.
+            Parameters:
+            data – The input bytes (or a memoryview of them).
+            algorithm – Name of the algorithm.
+            level – Compression level (with any options that change the output).
+            dictionary_id – Id of the trained dictionary used, if any.
+            Returns:
+            A hex string that is also the entry's file name.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        meta = f"{algorithm}:{level}:{dictionary_id}:{CACHE_VERSION}".encode()
+        return hashlib.sha256(digest.encode() + b":" + meta).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".bin")
+
+    def get(self, key: str, output_path: str) -> bool:
+        """Copies the cached entry to output_path.
+            Returns:
+            True on a hit, False if there is no entry for key.
+        """
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, output_path)
+        except FileNotFoundError:
+            return False
+        os.utime(path)
+        return True
+
+    def put(self, key: str, compressed_path: str) -> None:
+        """Stores a copy of the compressed file under key and evicts old entries."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(compressed_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def compress(self, data: bytes, algorithm: str, output_path: str, compress,
+                 level: int | str = 0, dictionary_id: int | None = None) -> tuple[str, bool]:
+        """Returns the cached output for data, running compress on a miss.
+            Parameters:
+            data – The input bytes.
+            algorithm – Name of the algorithm.
+            output_path – Where the compressed file is expected.
+            compress – Callable that compresses the input and returns the path it wrote.
+            level – Compression level.
+            dictionary_id – Id of the trained dictionary used, if any.
+            Returns:
+            The path of the compressed file and whether it came from the cache.
+        """
+        key = self.key(data, algorithm, level, dictionary_id)
+        if self.get(key, output_path):
+            return output_path, True
+        compressed_path = compress()
+        self.put(key, compressed_path)
+        return compressed_path, False
@@ -0,0 +1,231 @@
+"""
+COMPARE.PY
+Runs every codec on one file side by side, keeps a history of the results
+and flags throughput regressions against it.
+"""
+
+import json
+import os
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from statistics import median
+from time import perf_counter
+
+from algorithms.cache import DEFAULT_CACHE_DIR
+from algorithms.levels import DEFAULT_LEVEL
+from algorithms.registry import ALGORITHMS, compress_bytes, decompress_bytes, load_codec
+
+DEFAULT_HISTORY = os.path.join(DEFAULT_CACHE_DIR, "history.jsonl")
+METRICS = ["compress_mb_s", "decompress_mb_s"]
+
+
+def benchmark_codec(algorithm: str, path: str, level: int = DEFAULT_LEVEL, memory: bool = True,
+                    repeats: int = 3, min_time: float = 1.0) -> dict:
+    """Compresses and decompresses a file with one codec.
+        Parameters:
+        algorithm – Name of the algorithm.
+        path – File to run on.
+        level – Compression level (deflate and lz77).
+        memory – Also measure the peak memory, in a separate pass under
+        tracemalloc so tracing does not slow the timed passes.
+        repeats – Least number of timed passes.
+        min_time – Timed passes continue until they take this many seconds in total.
+        Returns:
+        A result with the sizes, ratio, throughput in MB/s of the fastest
+        pass, the number of passes and peak memory in MB.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    load_codec(algorithm)
+    compress_times = []
+    decompress_times = []
+    while len(compress_times) < repeats or sum(compress_times) + sum(decompress_times) < min_time:
+        start = perf_counter()
+        compressed = compress_bytes(algorithm, data, level=level)
+        compressed_at = perf_counter()
+        restored = decompress_bytes(algorithm, compressed)
+        decompressed_at = perf_counter()
+        if restored != data:
+            raise RuntimeError(f"{algorithm} did not restore {path}")
+        compress_times.append(compressed_at - start)
+        decompress_times.append(decompressed_at - compressed_at)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            decompress_bytes(algorithm, compress_bytes(algorithm, data, level=level))
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+
+    megabytes = len(data) / 1e6
+    return {
+        'algorithm': algorithm,
+        'level': level,
+        'original_size': len(data),
+        'compressed_size': len(compressed),
+        'ratio': len(data) / len(compressed) if compressed else 0.0,
+        'compress_mb_s': megabytes / max(min(compress_times), 1e-9),
+        'decompress_mb_s': megabytes / max(min(decompress_times), 1e-9),
+        'runs': len(compress_times),
+        'peak_mb': peak,
+    }
+
+
+def compare_codecs(path: str, algorithms: list[str] | None = None, level: int = DEFAULT_LEVEL,
+                   workers: int | None = None, memory: bool = True, repeats: int = 3) -> list[dict]:
+    """Runs benchmark_codec for every algorithm in parallel worker processes.
+        Returns:
+        The results in the order of algorithms.
+    """
+    algorithms = algorithms or ALGORITHMS
+    with ProcessPoolExecutor(max_workers=workers or len(algorithms)) as pool:
+        futures = [pool.submit(benchmark_codec, algorithm, path, level, memory, repeats) for algorithm in algorithms]
+        return [future.result() for future in futures]
+
+
+def file_digest(path: str) -> str:
+    """sha256 of the file content, so history only compares runs on the same input."""
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_history(digest: str, history_path: str = DEFAULT_HISTORY, level: int | None = None) -> list[dict]:
+    """Returns the earlier results for the file with this digest, oldest first.
+        Only results of the given level are returned if one is given.
+    """
+    if not os.path.exists(history_path):
+        return []
+    entries = []
+    with open(history_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('digest') == digest and (level is None or entry.get('level') == level):
+                entries.append(entry)
+    return entries
+
+
+def save_history(path: str, digest: str, results: list[dict], history_path: str = DEFAULT_HISTORY) -> None:
+    """Appends results to the history file, one JSON line per codec."""
+    os.makedirs(os.path.dirname(history_path) or ".", exist_ok=True)
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    with open(history_path, "a", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(dict(result, time=timestamp, file=os.path.abspath(path), digest=digest)) + "\n")
+
+
+def find_regressions(results: list[dict], history: list[dict], tolerance: float = 0.2,
+                     window: int = 5) -> list[str]:
+    """Compares results with the median of the last runs in history.
+        Parameters:
+        results – Results of the current run.
+        history – Earlier results for the same input.
+        tolerance – Allowed slowdown (0.2 is 20%).
+        window – Number of earlier runs per codec and level the baseline uses.
+        Returns:
+        A message for every metric that got slower than allowed.
+    """
+    messages = []
+    for result in results:
+        earlier = [entry for entry in history
+                   if entry['algorithm'] == result['algorithm'] and entry.get('level') == result['level']][-window:]
+        if not earlier:
+            continue
+        for metric in METRICS:
+            baseline = median(entry[metric] for entry in earlier)
+            if result[metric] < baseline * (1 - tolerance):
+                messages.append(f"{result['algorithm']}: {metric} {result[metric]:.3f} MB/s, "
+                                f"median of the last {len(earlier)} runs {baseline:.3f} MB/s")
+    return messages
+
+
+def plot_dashboard(results: list[dict], history: list[dict], figure=None):
+    """Draws ratio, throughput, peak memory and throughput history side by side.
+        Parameters:
+        results – Results of the current run.
+        history – Earlier results for the same input.
+        figure – matplotlib Figure to draw on; a new one is made if not given.
+        Returns:
+        The figure.
+    """
+    if figure is None:
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=(10, 7))
+    figure.clear()
+    names = [result['algorithm'] for result in results]
+    positions = range(len(results))
+    ratio_axes, speed_axes, memory_axes, history_axes = figure.subplots(2, 2).flat
+
+    ratio_axes.bar(names, [result['ratio'] for result in results], color="#FF4D00")
+    ratio_axes.set_title("Compression ratio")
+
+    width = 0.4
+    speed_axes.bar([p - width / 2 for p in positions], [r['compress_mb_s'] for r in results], width,
+                   label="compress", color="#FF4D00")
+    speed_axes.bar([p + width / 2 for p in positions], [r['decompress_mb_s'] for r in results], width,
+                   label="decompress", color="#888888")
+    speed_axes.set_xticks(list(positions), names)
+    speed_axes.set_title("Throughput (MB/s)")
+    speed_axes.legend()
+
+    memory_axes.bar(names, [result['peak_mb'] or 0 for result in results], color="#888888")
+    memory_axes.set_title("Peak memory (MB)")
+
+    runs = history + [dict(result, time="now") for result in results]
+    for result in results:
+        points = [entry['compress_mb_s'] for entry in runs
+                  if entry['algorithm'] == result['algorithm'] and entry.get('level') == result['level']]
+        history_axes.plot(range(1, len(points) + 1), points, marker="o", label=result['algorithm'])
+    history_axes.set_title("Compress MB/s per run")
+    history_axes.set_xlabel("run")
+    history_axes.legend()
+    figure.tight_layout()
+    return figure
+
+
+def main():
+    """Compares the codecs on a file and fails on throughput regressions"""
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Compare all codecs on a file.")
+    parser.add_argument("file", help="File to compare the codecs on")
+    parser.add_argument("--level", type=int, default=DEFAULT_LEVEL, help="Deflate/lz77 level")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="History file (JSON lines)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before failing")
+    parser.add_argument("--plot", default=None, help="Save the dashboard to this image file")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes per codec; the fastest counts")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory pass")
+    args = parser.parse_args()
+
+    digest = file_digest(args.file)
+    history = load_history(digest, args.history, args.level)
+    results = compare_codecs(args.file, level=args.level, workers=args.workers, memory=not args.no_memory,
+                             repeats=args.repeats)
+    print(f"{'algorithm':<10}{'ratio':>8}{'comp MB/s':>11}{'decomp MB/s':>13}{'peak MB':>10}")
+    for result in results:
+        peak = f"{result['peak_mb']:.2f}" if result['peak_mb'] is not None else "-"
+        print(f"{result['algorithm']:<10}{result['ratio']:>8.2f}{result['compress_mb_s']:>11.3f}"
+              f"{result['decompress_mb_s']:>13.3f}{peak:>10}")
+    regressions = find_regressions(results, history, args.tolerance)
+    save_history(args.file, digest, results, args.history)
+    if args.plot:
+        import matplotlib
+        matplotlib.use("Agg")
+        plot_dashboard(results, history).savefig(args.plot)
+    for message in regressions:
+        print(f"Regression: {message}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,62 @@ DEFLATE.PY
 import heapq
 import pickle
 from datetime import datetime
+from algorithms.dictionary import check_dictionary
+from algorithms.errors import CorruptDataError, DictionaryError, OutputLimitError, check_output, safe_loads
+from algorithms.fileio import map_file
+from algorithms.stats import CodecStats, stage
+from algorithms.levels import DEFLATE_LEVELS as LEVELS, DEFAULT_LEVEL
+from algorithms.huffman import decode_bits
+from algorithms.matchfinder import BinaryTreeMatchFinder
+from algorithms.ldm import long_range_parse
+from algorithms.rangecoder import ORDERS, range_encode_tokens, range_decode_tokens
+from algorithms.alphabets import MIN_MATCH, END_OF_BLOCK, bucket, token_symbols, code_lengths, \
+    encode_tokens, decode_tokens, pack_lengths, unpack_lengths
+
+# files start with the magic and format version, then the 4-byte header size,
+# the pickled header, the number of padding bits and the coded payload.
+# Unversioned (baseline) files start with the header size, a pickled Huffman
+# code table of the LZ77 bytes, and the coded bits right after it.
+FORMAT_MAGIC = b"DFL\x02"
 
 #COMPRESS
 
-def compress_lz77(data: bytes, window_size: int =4096, lookahead: int =15) -> list[int | tuple[int, int]]:
+def compress_lz77(data: bytes, window_size: int =4096, lookahead: int =15,
+                  dictionary: bytes = b"", stats: CodecStats | None = None,
+                  match_finder: str = "hash") -> list[int | tuple[int, int]]:
     """
     Compresses using lz77.
+    The window is primed with dictionary content if one is given.
+    match_finder is "hash" (2-byte hash chains, for small windows)
+    or "bt" (binary trees, for windows of a megabyte and more).
     """
-    compressed = []
-    i = 0
-    n = len(data)
+    if match_finder == "bt":
+        return compress_lz77_bt(data, window_size, lookahead, dictionary, stats)
+    i = len(dictionary)
+    if dictionary:
+        data = dictionary + data
     hash_table = {}
+    for j in range(i - 1):
+        hash_table.setdefault((data[j], data[j+1]), []).append(j)
+    return _greedy_hash(data, i, len(data), window_size, lookahead, hash_table, stats)
 
-    while i < n:
+def _greedy_hash(data: bytes, start: int, end: int, window_size: int, lookahead: int,
+                 hash_table: dict, stats: CodecStats | None = None) -> list[int | tuple[int, int]]:
+    """
+    Parses data[start:end] taking the longest match found in the hash chains.
+    Matches are cut at end; the position of every token is added to hash_table.
+    """
+    matches = match_bytes = chain_steps = 0
+    compressed = []
+    i = start
+    while i < end:
         best_len = 0
         best_dist = 0
-        max_len = min(lookahead, n - i)
-        if i + 2 < n:
+        max_len = min(lookahead, end - i)
+        if i + 2 < end:
             key = (data[i], data[i+1])
             for j in hash_table.get(key, []):
+                chain_steps += 1
                 if i - j > window_size:
                     continue
                 length = 0
@@ -36,12 +73,287 @@ def compress_lz77(data: bytes, window_size: int =4096, lookahead: int =15) -> li
 
         if best_len >= 3:
             compressed.append((best_dist, best_len))
+            matches += 1
+            match_bytes += best_len
+            i += best_len
+        else:
+            compressed.append(data[i])
+            i += 1
+    if stats is not None:
+        stats.count('matches', matches)
+        stats.count('match_bytes', match_bytes)
+        stats.count('literals', len(compressed) - matches)
+        stats.count('chain_steps', chain_steps)
+    return compressed
+
+def compress_lz77_bt(data: bytes, window_size: int = 1 << 20, lookahead: int = 258,
+                     dictionary: bytes = b"", stats: CodecStats | None = None) -> list[int | tuple[int, int]]:
+    """
+    Compresses using lz77, taking the longest match from a binary-tree match finder.
+    """
+    start = len(dictionary)
+    if dictionary:
+        data = dictionary + data
+    finder = BinaryTreeMatchFinder(data, window_size, lookahead)
+    for j in range(start):
+        finder.find(j)
+    return _greedy_bt(finder, start, len(data), stats)
+
+def _greedy_bt(finder: BinaryTreeMatchFinder, start: int, end: int,
+               stats: CodecStats | None = None) -> list[int | tuple[int, int]]:
+    """
+    Parses finder.data[start:end] taking the longest match at every position.
+    Matches are cut at end; every position parsed is inserted into the finder.
+    """
+    data = finder.data
+    steps = finder.steps
+    matches = match_bytes = 0
+    compressed = []
+    i = start
+    while i < end:
+        found = finder.find(i)
+        best_len = min(found[-1][1], end - i) if found else 0
+        if best_len >= MIN_MATCH:
+            compressed.append((found[-1][0], best_len))
+            matches += 1
+            match_bytes += best_len
+            for j in range(i + 1, i + best_len):
+                finder.find(j)
             i += best_len
         else:
             compressed.append(data[i])
             i += 1
+    if stats is not None:
+        stats.count('matches', matches)
+        stats.count('match_bytes', match_bytes)
+        stats.count('literals', len(compressed) - matches)
+        stats.count('chain_steps', finder.steps - steps)
     return compressed
 
+def _clip_matches(found: list[tuple[int, int]], limit: int) -> list[tuple[int, int]]:
+    """
+    Cuts (distance, length) pairs from a match finder to at most limit bytes.
+    """
+    if not found or found[-1][1] <= limit:
+        return found
+    clipped = [match for match in found if match[1] < limit]
+    if limit >= MIN_MATCH:
+        clipped.append((found[-1][0], limit))
+    return clipped
+
+def find_matches(data: bytes, start: int, window_size: int = 4096, lookahead: int = 15,
+                 max_chain: int = 64, match_finder: str = "hash") -> list[list[tuple[int, int]]]:
+    """
+    Finds match candidates for every position from start on.
+    Each position gets (distance, longest length) pairs, each one longer than the one before.
+    """
+    n = len(data)
+    if match_finder == "bt":
+        finder = BinaryTreeMatchFinder(data, window_size, lookahead, max_chain)
+        for j in range(start):
+            finder.find(j)
+        return [finder.find(i) for i in range(start, n)]
+    hash_table = {}
+    for j in range(start - 1):
+        hash_table.setdefault((data[j], data[j+1]), []).append(j)
+    candidates = []
+    for i in range(start, n):
+        found = []
+        max_len = min(lookahead, n - i)
+        if i + 2 < n:
+            key = (data[i], data[i+1])
+            chain = hash_table.setdefault(key, [])
+            best_len = 2
+            steps = 0
+            for j in reversed(chain):
+                if i - j > window_size or steps == max_chain:
+                    break
+                steps += 1
+                length = 0
+                while length < max_len and data[j + length] == data[i + length]:
+                    length += 1
+                if length > best_len:
+                    best_len = length
+                    found.append((i - j, length))
+                    if length == max_len:
+                        break
+            chain.append(i)
+        candidates.append(found)
+    return candidates
+
+def _prices(lengths: list[int]) -> list[int]:
+    """
+    Bit cost of every symbol; symbols without a code are priced above the longest code.
+    """
+    missing = max(lengths, default=8) + 2
+    return [length or missing for length in lengths]
+
+def _match_bits(dist: int, length: int, litlen: list[int], dists: list[int]) -> int:
+    """
+    Bits a match costs: its length and distance codes plus their extra bits.
+    """
+    symbol, extra, _ = bucket(length - MIN_MATCH)
+    dist_symbol, dist_extra, _ = bucket(dist - 1)
+    return litlen[257 + symbol] + extra + dists[dist_symbol] + dist_extra
+
+def token_bits(tokens: list[int | tuple[int, int]], litlen_lengths: list[int],
+               dist_lengths: list[int]) -> int:
+    """
+    Number of bits encode_tokens writes for tokens with the given code lengths.
+    """
+    litlen = _prices(litlen_lengths)
+    dists = _prices(dist_lengths)
+    return litlen[END_OF_BLOCK] + sum(
+        _match_bits(*token, litlen, dists) if isinstance(token, tuple) else litlen[token]
+        for token in tokens)
+
+def token_code_lengths(tokens: list[int | tuple[int, int]]) -> tuple[list[int], list[int]]:
+    """
+    Literal/length and distance code lengths fitted to tokens.
+    """
+    litlen_freq, dist_freq = token_symbols(tokens)
+    return code_lengths(litlen_freq), code_lengths(dist_freq)
+
+def optimal_parse(data: bytes, start: int, candidates: list[list[tuple[int, int]]],
+                  litlen_lengths: list[int], dist_lengths: list[int],
+                  nice_length: int = 32, end: int | None = None) -> list[int | tuple[int, int]]:
+    """
+    Chooses the cheapest sequence of literals and matches by dynamic programming.
+    The cost of a token is the number of bits encode_tokens writes for it.
+    Matches longer than nice_length are only tried at their full length.
+    Parses data[start:end], or up to the end of data.
+    """
+    litlen = _prices(litlen_lengths)
+    dists = _prices(dist_lengths)
+    length_cost = [0] * MIN_MATCH + [litlen[257 + symbol] + extra for symbol, extra, _ in
+                                     (bucket(length - MIN_MATCH) for length in range(MIN_MATCH, nice_length + 1))]
+    m = (len(data) if end is None else end) - start
+    cost = [0] + [float('inf')] * m
+    choice = [None] * (m + 1)
+    for p in range(m):
+        base = cost[p]
+        if base + litlen[data[start + p]] < cost[p + 1]:
+            cost[p + 1] = base + litlen[data[start + p]]
+            choice[p + 1] = None
+        for dist, max_len in candidates[p]:
+            dist_symbol, dist_extra, _ = bucket(dist - 1)
+            dist_cost = base + dists[dist_symbol] + dist_extra
+            for length in range(MIN_MATCH, min(max_len, nice_length) + 1):
+                total = dist_cost + length_cost[length]
+                if total < cost[p + length]:
+                    cost[p + length] = total
+                    choice[p + length] = (dist, length)
+            if max_len > nice_length:
+                symbol, extra, _ = bucket(max_len - MIN_MATCH)
+                total = dist_cost + litlen[257 + symbol] + extra
+                if total < cost[p + max_len]:
+                    cost[p + max_len] = total
+                    choice[p + max_len] = (dist, max_len)
+    tokens = []
+    p = m
+    while p > 0:
+        token = choice[p]
+        if token is None:
+            tokens.append(data[start + p - 1])
+            p -= 1
+        else:
+            tokens.append(token)
+            p -= token[1]
+    tokens.reverse()
+    return tokens
+
+def compress_lz77_optimal(data: bytes, window_size: int = 4096, lookahead: int = 15,
+                          dictionary: bytes = b"",
+                          lengths: tuple[list[int], list[int]] | None = None,
+                          iterations: int = 3, stats: CodecStats | None = None,
+                          match_finder: str = "hash") -> list[int | tuple[int, int]]:
+    """
+    Compresses using lz77 with optimal parsing instead of greedy matching.
+    Starts from the greedy parse and reprices tokens with the code lengths
+    of the previous parse, keeping the parse with the fewest coded bits.
+    With fixed code lengths (from a trained dictionary) a single pass is made.
+    """
+    start = len(dictionary)
+    if dictionary:
+        data = dictionary + data
+    candidates = find_matches(data, start, window_size, lookahead, match_finder=match_finder)
+    best = compress_lz77(data[start:], window_size, lookahead, dictionary, match_finder=match_finder)
+    return _refine_parse(data, start, len(data), candidates, best, lengths, iterations, stats)
+
+def _refine_parse(data: bytes, start: int, end: int, candidates: list[list[tuple[int, int]]],
+                  best: list[int | tuple[int, int]],
+                  lengths: tuple[list[int], list[int]] | None = None,
+                  iterations: int = 3, stats: CodecStats | None = None) -> list[int | tuple[int, int]]:
+    """
+    Improves the parse best of data[start:end] by repeated optimal parsing (see compress_lz77_optimal).
+    """
+    if lengths is None:
+        current = token_code_lengths(best)
+    else:
+        current = lengths
+        iterations = 1
+    best_bits = token_bits(best, *current)
+    done = 0
+    for done in range(1, iterations + 1):
+        tokens = optimal_parse(data, start, candidates, *current, end=end)
+        if lengths is None:
+            current = token_code_lengths(tokens)
+        bits = token_bits(tokens, *current)
+        if bits >= best_bits:
+            break
+        best, best_bits = tokens, bits
+    if stats is not None:
+        matches = [token for token in best if isinstance(token, tuple)]
+        stats.count('matches', len(matches))
+        stats.count('match_bytes', sum(length for _, length in matches))
+        stats.count('literals', len(best) - len(matches))
+        stats.count('parse_iterations', done)
+    return best
+
+def span_parser(info: bytes, content: bytes, window_size: int, lookahead: int, match_finder: str,
+                optimal: bool, lengths: tuple[list[int], list[int]] | None = None,
+                stats: CodecStats | None = None):
+    """
+    Returns parse(start, end) for long_range_parse: the LZ77 tokens of info[start:end],
+    matched against the bytes before start and the dictionary content.
+    The hash chains and binary-tree match finders are built once over the whole
+    input and shared by the spans, so a span costs only its own length (optimal
+    parsing with hash chains is primed with one window of preceding bytes).
+    """
+    data = content + info if content else info
+    offset = len(content)
+    if match_finder != "bt" and optimal:
+        def parse(start, end):
+            start += offset
+            end += offset
+            prime = bytes(data[max(0, start - window_size):start])
+            return compress_lz77_optimal(data[start:end], window_size, lookahead, prime,
+                                         lengths=lengths, stats=stats, match_finder=match_finder)
+        return parse
+    if match_finder != "bt":
+        hash_table = {}
+        for j in range(offset - 1):
+            hash_table.setdefault((data[j], data[j+1]), []).append(j)
+        return lambda start, end: _greedy_hash(data, start + offset, end + offset, window_size,
+                                               lookahead, hash_table, stats)
+
+    finder = BinaryTreeMatchFinder(data, window_size, lookahead)
+    candidate_finder = BinaryTreeMatchFinder(data, window_size, lookahead, 64) if optimal else None
+    for j in range(offset):
+        finder.find(j)
+        if optimal:
+            candidate_finder.find(j)
+
+    def parse(start, end):
+        start += offset
+        end += offset
+        if not optimal:
+            return _greedy_bt(finder, start, end, stats)
+        greedy = _greedy_bt(finder, start, end)
+        candidates = [_clip_matches(candidate_finder.find(i), end - i) for i in range(start, end)]
+        return _refine_parse(data, start, end, candidates, greedy, lengths, stats=stats)
+    return parse
+
 def lz77_to_bytes(compressed: list[tuple[int, int] | int]) -> bytearray:
     """
     converts lz77 to bytes.
@@ -58,87 +370,105 @@ def lz77_to_bytes(compressed: list[tuple[int, int] | int]) -> bytearray:
             output.append(item)
     return output
 
-class Node:
+def bitstring_to_bytes(s: str) -> bytes:
     """
-    Node for Huffman tree.
+    Converts bytestring to bytes, padding the last byte with zeros on the right.
     """
-    def __init__(self, symbol=None, freq=0):
-        self.symbol = symbol
-        self.freq = freq
-        self.left = None
-        self.right = None
-    def __lt__(self, other):
-        return self.freq < other.freq
+    if not s:
+        return b""
+    padding = (8 - len(s) % 8) % 8
+    return (int(s, 2) << padding).to_bytes((len(s) + padding) // 8, 'big')
 
-def build_huffman_tree(data: bytes) -> Node:
+def deflate_parts(info: bytes, window_size: int | None = None, dictionary: dict | None = None,
+                  stats: CodecStats | None = None, level: int = DEFAULT_LEVEL,
+                  long_range: bool = False, entropy: str = "huffman", order: int = 0) -> list[bytes]:
     """
-    builds huffman tree.
+    Makes pseudodeflate compression of bytes or a memoryview.
+    Returns the output as separate buffers, ready for writelines.
+    Tokens are Huffman coded with separate literal/length and distance
+    alphabets (see alphabets.py); the header keeps only their code lengths.
+    With a trained dictionary the header references its id instead.
+    The level (see LEVELS) picks the window size unless one is given,
+    and the top level uses optimal parsing.
+    With long_range, long repeats at any distance are found first (see ldm.py)
+    and only the data between them goes through the LZ77 parser.
+    The header ends with the uncompressed size, which bounds the decoder.
+    entropy "range" codes the same tokens with the adaptive range coder
+    of the given context order instead (see range_encode_tokens).
     """
-    freq = {}
-    for b in data:
-        freq[b] = freq.get(b, 0) + 1
-    heap = [Node(sym, f) for sym, f in freq.items()]
-    heapq.heapify(heap)
-    while len(heap) > 1:
-        l = heapq.heappop(heap)
-        r = heapq.heappop(heap)
-        m = Node(freq=l.freq + r.freq)
-        m.left = l
-        m.right = r
-        heapq.heappush(heap, m)
-    return heap[0]
-
-def make_codes(node: Node, prefix: str = "", table: dict | None = None) -> dict[int, str]:
-    """
-    Creates Huffman code tablet.
-    """
-    if table is None:
-        table = {}
-    if node.symbol is not None:
-        table[node.symbol] = prefix
-    else:
-        make_codes(node.left, prefix + "0", table)
-        make_codes(node.right, prefix + "1", table)
-    return table
+    level_window, lookahead, match_finder, optimal = LEVELS[level]
+    window_size = window_size or level_window
+    content = dictionary['content'] if dictionary is not None else b""
 
-def huffman_compress(data: bytes) -> str:
-    """
-    Codes data using Huffman tablet.
-    """
-    tree = build_huffman_tree(data)
-    codes = make_codes(tree)
-    encoded = ''.join(codes[b] for b in data)
-    return encoded
+    def parse(span, prime):
+        if optimal:
+            return compress_lz77_optimal(span, window_size, lookahead, prime,
+                                         lengths=dictionary.get('deflate_token_lengths') if dictionary else None,
+                                         stats=stats, match_finder=match_finder)
+        return compress_lz77(span, window_size, lookahead, prime, stats, match_finder)
+
+    with stage(stats, 'lz77'):
+        if long_range:
+            lz77 = long_range_parse(info, span_parser(info, content, window_size, lookahead, match_finder, optimal,
+                                                      dictionary.get('deflate_token_lengths') if dictionary else None,
+                                                      stats), stats=stats)
+        else:
+            lz77 = parse(info, content)
+    dict_id = dictionary['id'] if dictionary is not None else None
+    if entropy == "range":
+        with stage(stats, 'range_coding'):
+            compressed_bytes = range_encode_tokens(lz77, order)
+        with stage(stats, 'pickling'):
+            codes_serialized = pickle.dumps(("range_tokens", order, dict_id, len(info)))
+        if stats is not None:
+            stats.count('input_bytes', len(info))
+            stats.count('output_bytes', 9 + len(codes_serialized) + len(compressed_bytes))
+        return [FORMAT_MAGIC, len(codes_serialized).to_bytes(4, 'big'), codes_serialized, bytes([0]),
+                compressed_bytes]
+    if dictionary is not None and 'deflate_token_lengths' in dictionary:
+        litlen_lengths, dist_lengths = dictionary['deflate_token_lengths']
+        header = ("tokens", None, None, dict_id, len(info))
+    else:
+        with stage(stats, 'huffman_codes'):
+            litlen_lengths, dist_lengths = token_code_lengths(lz77)
+        header = ("tokens", pack_lengths(litlen_lengths), pack_lengths(dist_lengths), dict_id, len(info))
+    with stage(stats, 'bit_packing'):
+        compressed_bytes, padding = encode_tokens(lz77, litlen_lengths, dist_lengths)
+    with stage(stats, 'pickling'):
+        codes_serialized = pickle.dumps(header)
+    if stats is not None:
+        stats.count('code_table_size', sum(1 for length in litlen_lengths + dist_lengths if length))
+        stats.count('input_bytes', len(info))
+        stats.count('output_bytes', 9 + len(codes_serialized) + len(compressed_bytes))
+    header_size = len(codes_serialized).to_bytes(4, 'big')
+    return [FORMAT_MAGIC, header_size, codes_serialized, bytes([padding]), compressed_bytes]
 
-def bitstring_to_bytes(s: str) -> bytearray:
+def deflate_bytes(info: bytes, window_size: int | None = None, dictionary: dict | None = None,
+                  stats: CodecStats | None = None, level: int = DEFAULT_LEVEL,
+                  long_range: bool = False, entropy: str = "huffman", order: int = 0) -> bytes:
     """
-    Converts bytestring to bytes.
+    Makes pseudodeflate compression of bytes in memory.
     """
-    return bytearray(int(s[i:i+8], 2) for i in range(0, len(s), 8))
+    return b"".join(deflate_parts(info, window_size, dictionary, stats, level, long_range,
+                                  entropy, order))
 
-def deflate_bit_compress(filename: str, data: bool = False) -> bytes | tuple[bytes, dict]:
+def deflate_bit_compress(filename: str, data: bool = False, dictionary: dict | None = None,
+                         level: int = DEFAULT_LEVEL) -> bytes | tuple[bytes, dict]:
     """
     Makes pseudodeflate compression.
+    With data=True also returns sizes, the total time and per-stage 'Stats'.
     """
-    with open(filename, 'rb') as file:
-        info = file.read()
+    info = map_file(filename)
+    stats = CodecStats('deflate') if data else None
     start = datetime.now()
-    lz77 = compress_lz77(info)
-    lz_bytes = lz77_to_bytes(lz77)
-    tree = build_huffman_tree(lz_bytes)
-    codes = make_codes(tree)
-    encoded_bits = ''.join(codes[b] for b in lz_bytes)
-    compressed_bytes = bitstring_to_bytes(encoded_bits)
-    codes_serialized = pickle.dumps(codes)
-    header_size = len(codes_serialized).to_bytes(4, 'big')
-    final_data = header_size + codes_serialized + compressed_bytes
-
+    final_data = deflate_bytes(info, dictionary=dictionary, stats=stats, level=level)
     end = datetime.now()
     if data:
         return final_data, {
             'Original size': len(info),
             'Compressed size': len(final_data),
-            'Time': end - start
+            'Time': end - start,
+            'Stats': stats.as_dict()
         }
 
     return final_data
@@ -149,102 +479,250 @@ def bytes_to_bitstring(data: bytes) -> str:
     """
     Converts bytes into string.
     """
-    return ''.join(f'{byte:08b}' for byte in data)
-
-def rebuild_tree_from_codes(codes: dict[int, str]) -> Node:
-    """
-    Rebuilds Huffman tree
-    """
-    root = Node()
-    for symbol, code in codes.items():
-        node = root
-        for bit in code:
-            if bit == '0':
-                if not node.left:
-                    node.left = Node()
-                node = node.left
-            else:
-                if not node.right:
-                    node.right = Node()
-                node = node.right
-        node.symbol = symbol
-    return root
+    if not data:
+        return ''
+    return bin(int.from_bytes(data, 'big'))[2:].zfill(len(data) * 8)
 
 def huffman_decompress(bitstring: str, codes: dict[int, str]) -> bytearray:
     """
     Decompresses the string using Huffman tablet.
     """
-    root = rebuild_tree_from_codes(codes)
-    result = bytearray()
-    node = root
-    for bit in bitstring:
-        node = node.left if bit == '0' else node.right
-        if node.symbol is not None:
-            result.append(node.symbol)
-            node = root
-    return result
+    return decode_bits(bitstring_to_bytes(bitstring), len(bitstring), codes)
 
 def bytes_to_lz77(decoded_bytes: bytearray) -> list[tuple[int, int] | int]:
     """
     Converts bytes in LZ77 list again.
+    Raises CorruptDataError on unknown markers and cut off tokens.
     """
     i = 0
+    n = len(decoded_bytes)
     result = []
-    while i < len(decoded_bytes):
+    while i < n:
         marker = decoded_bytes[i]
 
         if marker == 0:
-            if i + 3 >= len(decoded_bytes):
-                break
+            if i + 3 >= n:
+                raise CorruptDataError("LZ77 bytes end inside a match")
             dist = (decoded_bytes[i + 1] << 8) | decoded_bytes[i + 2]
             length = decoded_bytes[i + 3]
             result.append((dist, length))
             i += 4
 
         elif marker == 1:
-            if i + 1 >= len(decoded_bytes):
-                break
+            if i + 1 >= n:
+                raise CorruptDataError("LZ77 bytes end inside a literal")
             result.append(decoded_bytes[i + 1])
             i += 2
 
         else:
-            i += 1
+            raise CorruptDataError(f"Unknown LZ77 marker {marker} at {i}")
 
     return result
 
-def decompress_lz77(compressed: list[tuple[int, int] | int]) -> bytes:
+def decompress_lz77(compressed: list[tuple[int, int] | int], dictionary: bytes = b"",
+                    max_output: int | None = None) -> bytes:
     """
-    Decompresses the LZ77 tuple
+    Decompresses the LZ77 tuple.
+    Matches that reach back before the start of the data raise CorruptDataError,
+    and matches that would grow the output past max_output raise OutputLimitError
+    before they are copied.
     """
-    result = bytearray()
+    result = bytearray(dictionary)
+    limit = None if max_output is None else len(dictionary) + max_output
     for item in compressed:
         if isinstance(item, tuple):
             dist, length = item
+            if not 0 < dist <= len(result):
+                raise CorruptDataError(f"Match distance {dist} at {len(result) - len(dictionary)} "
+                                       f"is out of range")
+            if limit is not None and len(result) + length > limit:
+                raise OutputLimitError(f"Output is over the limit of {max_output} bytes")
             start = len(result) - dist
+            if dist >= length:
+                result += result[start:start + length]
+                continue
             for _ in range(length):
                 result.append(result[start])
                 start += 1
         else:
             result.append(item)
+    del result[:len(dictionary)]
+    check_output(len(result), max_output)
     return bytes(result)
 
-def inflate_bit_decompress(compressed_data: bytes, info: bool=False) -> bytes | tuple[bytes, dict[str, int]]:
+def read_header(compressed_data: memoryview) -> tuple:
+    """
+    Reads and checks the header of a pseudodeflate file.
+    Returns the header and the offset of the data after it.
+    Files with FORMAT_MAGIC have a tuple header, unversioned files the
+    Huffman code table of their LZ77 bytes.
+    The header is unpickled without building any objects but plain
+    containers; a malformed one raises CorruptDataError.
+    """
+    versioned = compressed_data[:4] == FORMAT_MAGIC
+    start = 4 if versioned else 0
+    if len(compressed_data) < start + 4:
+        raise CorruptDataError("Deflate data is too short")
+    header_size = int.from_bytes(compressed_data[start:start + 4], 'big')
+    end = start + 4 + header_size
+    if end > len(compressed_data):
+        raise CorruptDataError(f"Header of {header_size} bytes does not fit the data")
+    codes = safe_loads(compressed_data[start + 4:end])
+    if not versioned:
+        if not isinstance(codes, dict):
+            raise CorruptDataError("Invalid deflate header")
+        return codes, end
+    if not isinstance(codes, tuple) or not codes:
+        raise CorruptDataError("Invalid deflate header")
+    kind, *fields = codes
+    if kind == "tokens" and len(fields) == 4:
+        litlen, dist, dict_id, size = fields
+        # the code lengths may only be left out when a dictionary supplies them
+        valid = (litlen is None and dist is None and dict_id is not None) \
+            or (isinstance(litlen, bytes) and isinstance(dist, bytes))
+    elif kind == "range_tokens" and len(fields) == 3:
+        order, dict_id, size = fields
+        valid = order in ORDERS
+    else:
+        valid = False
+    if not valid or not isinstance(size, int) or size < 0 \
+            or not (dict_id is None or isinstance(dict_id, int)):
+        raise CorruptDataError("Invalid deflate header")
+    return codes, end
+
+class _BaselineNode:
+    """
+    Node of the Huffman tree the baseline encoder built.
+    """
+    def __init__(self, symbol=None, freq=0, left=None, right=None):
+        self.symbol = symbol
+        self.freq = freq
+        self.left = left
+        self.right = right
+
+    def __lt__(self, other):
+        return self.freq < other.freq
+
+def baseline_codes(data: bytes) -> dict[int, str]:
+    """
+    Rebuilds the code table the baseline encoder made for these LZ77 bytes.
+    Its heap compared nodes by frequency only, so ties fall differently than
+    in huffman.build_huffman_tree and the same heap has to be replayed here.
+    """
+    freq = {}
+    for b in data:
+        freq[b] = freq.get(b, 0) + 1
+    heap = [_BaselineNode(sym, f) for sym, f in freq.items()]
+    heapq.heapify(heap)
+    while len(heap) > 1:
+        left = heapq.heappop(heap)
+        right = heapq.heappop(heap)
+        heapq.heappush(heap, _BaselineNode(None, left.freq + right.freq, left, right))
+    codes = {}
+    stack = [(heap[0], "")] if heap else []
+    while stack:
+        node, prefix = stack.pop()
+        if node.symbol is not None:
+            codes[node.symbol] = prefix
+        else:
+            stack.append((node.right, prefix + "1"))
+            stack.append((node.left, prefix + "0"))
+    return codes
+
+def unversioned_lz77(payload: memoryview, codes: dict[int, str],
+                     max_output: int | None = None) -> list[tuple[int, int] | int]:
+    """
+    Decodes the Huffman coded LZ77 bytes of a file written before FORMAT_MAGIC.
+    The baseline encoder wrote the last 1-8 bits right-aligned into the last
+    byte without recording how many, so every count is tried. Zero bits in
+    front of them can decode to extra symbols that still parse; a count is
+    only accepted if its bytes rebuild the header's code table. When more
+    than one count still gives valid output the original cannot be told
+    apart and CorruptDataError is raised instead of guessing.
+    """
+    if not payload:
+        raise CorruptDataError("Unversioned deflate data has no coded bits")
+    head = bytes(payload[:-1])
+    last = payload[-1]
+    found = []
+    error = None
+    for used in range(max(last.bit_length(), 1), 9):
+        bits = head + bytes([(last << (8 - used)) & 0xFF])
+        try:
+            decoded = decode_bits(bits, len(head) * 8 + used, codes)
+            if baseline_codes(decoded) != codes:
+                raise CorruptDataError("The decoded bytes do not match the code table")
+            tokens = bytes_to_lz77(decoded)
+            result = decompress_lz77(tokens, b"", max_output)
+        except CorruptDataError as e:
+            error = e
+            continue
+        if all(result != other for _, other in found):
+            found.append((tokens, result))
+    if len(found) > 1:
+        raise CorruptDataError("The end of this unversioned deflate file decodes in more than one way")
+    if not found:
+        raise error
+    return found[0][0]
+
+def inflate_bit_decompress(compressed_data: bytes, info: bool=False, dictionary: dict | None = None,
+                           stats: CodecStats | None = None,
+                           max_output: int | None = None) -> bytes | tuple[bytes, dict[str, int]]:
     """
     Decompresses the data by pseudodeflate code.
+    Data compressed with a trained dictionary needs the same dictionary.
+    The output is capped at the size the header declares (and at max_output);
+    corrupt data raises CorruptDataError instead of decoding garbage.
+    Files without FORMAT_MAGIC, from before it was added, still decode
+    unless their last bits are ambiguous (see unversioned_lz77).
     """
+    if info and stats is None:
+        stats = CodecStats('deflate', 'decompress')
     start = datetime.now()
-    header_size = int.from_bytes(compressed_data[:4], 'big')
-    codes_serialized = compressed_data[4:4+header_size]
-    codes = pickle.loads(codes_serialized)
-    compressed_bytes = compressed_data[4+header_size:]
-    bitstring = bytes_to_bitstring(compressed_bytes)
-    decoded_bytes = huffman_decompress(bitstring, codes)
-    lz77_data = bytes_to_lz77(decoded_bytes)
-    result = decompress_lz77(lz77_data)
+    with stage(stats, 'header'):
+        compressed_data = memoryview(compressed_data)
+        codes, payload_at = read_header(compressed_data)
+        if isinstance(codes, dict):
+            kind, dict_id, size = "bytes", None, None
+        elif codes[0] == "tokens":
+            kind, litlen_lengths, dist_lengths, dict_id, size = codes
+        else:
+            kind, order, dict_id, size = codes
+        check_dictionary(dict_id, dictionary)
+        content = dictionary['content'] if dict_id is not None else b""
+        if size is not None:
+            check_output(size, max_output)
+            max_output = size
+    if kind == "bytes":
+        with stage(stats, 'huffman_decode'):
+            lz77_data = unversioned_lz77(compressed_data[payload_at:], codes, max_output)
+    elif payload_at == len(compressed_data) or compressed_data[payload_at] > 7:
+        raise CorruptDataError("Missing or invalid padding byte")
+    compressed_bytes = compressed_data[payload_at + 1:]
+    if kind == "tokens":
+        if litlen_lengths is None:
+            if 'deflate_token_lengths' not in dictionary:
+                raise DictionaryError("The dictionary has no deflate code lengths, it is older than the data")
+            litlen_lengths, dist_lengths = dictionary['deflate_token_lengths']
+        else:
+            litlen_lengths, dist_lengths = unpack_lengths(litlen_lengths), unpack_lengths(dist_lengths)
+        with stage(stats, 'huffman_decode'):
+            lz77_data = decode_tokens(compressed_bytes, litlen_lengths, dist_lengths)
+    elif kind == "range_tokens":
+        with stage(stats, 'range_decode'):
+            lz77_data = range_decode_tokens(compressed_bytes, order, size)
+    with stage(stats, 'lz77_decode'):
+        result = decompress_lz77(lz77_data, content, max_output)
+    if size is not None and len(result) != size:
+        raise CorruptDataError(f"Decoded {len(result)} bytes, the header declares {size}")
     end = datetime.now()
+    if stats is not None:
+        stats.count('tokens', len(lz77_data))
+        stats.count('output_bytes', len(result))
     if info:
         return result, {
             "Decompressed size": len(result),
-            "Time:": end - start
+            "Time:": end - start,
+            "Stats": stats.as_dict()
         }
     return result
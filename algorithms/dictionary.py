@@ -0,0 +1,234 @@
+"""
+DICTIONARY.PY
+Trains shared dictionaries for compressing many small, similar files.
+"""
+
+import pickle
+
+from algorithms.errors import CorruptDataError, DictionaryError, safe_load
+
+
+def _gram_counts(samples: list[bytes], length: int) -> dict[bytes, int]:
+    """Counts in how many samples every substring of the given length occurs."""
+    counts = {}
+    for sample in samples:
+        for gram in {sample[i:i + length] for i in range(len(sample) - length + 1)}:
+            counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def _smoothed_codes(freq: dict[int, int]) -> dict[int, str]:
+    """Builds Huffman codes that can encode every byte value."""
+    from algorithms.huffman import build_huffman_tree, build_codes
+    return build_codes(build_huffman_tree({byte: freq.get(byte, 0) + 1 for byte in range(256)}))
+
+
+def train_content(samples: list[bytes], size: int = 4096, gram_length: int = 8) -> bytes:
+    """Builds the preset window content for LZ77 out of frequent substrings.
+        Parameters:
+        samples – Sample files.
+        size – Maximum content size in bytes.
+        gram_length – Length of the substrings that are counted.
+        Returns:
+        The content, with the most frequent substrings at its end
+        (closest to the data, so they get the shortest distances).
+    """
+    counts = _gram_counts(samples, gram_length)
+    ranked = sorted((gram for gram, count in counts.items() if count > 1),
+                    key=lambda gram: (-counts[gram], gram))
+    chosen = []
+    total = 0
+    for gram in ranked:
+        if total + len(gram) > size:
+            break
+        if any(gram in other for other in chosen):
+            continue
+        chosen.append(gram)
+        total += len(gram)
+    return b"".join(reversed(chosen))
+
+
+def train_phrases(samples: list[bytes], count: int = 1024, max_length: int = 16) -> list[bytes]:
+    """Picks frequent phrases to seed the LZW table with.
+        Parameters:
+        samples – Sample files.
+        count – Maximum number of phrases.
+        max_length – Maximum phrase length.
+        Returns:
+        A list of phrases that is closed under prefixes, so every phrase
+        can be reached by the LZW encoder one byte at a time.
+    """
+    scored = []
+    for length in range(2, max_length + 1):
+        for gram, found in _gram_counts(samples, length).items():
+            if found > 1:
+                scored.append((-found * length, gram))
+    scored.sort()
+    phrases = []
+    seen = set()
+    for _, gram in scored:
+        for end in range(2, len(gram) + 1):
+            prefix = gram[:end]
+            if prefix not in seen:
+                seen.add(prefix)
+                phrases.append(prefix)
+        if len(phrases) >= count:
+            break
+    return phrases[:count]
+
+
+def _framed(parts) -> bytes:
+    """Joins parts with the length of each in front, so different parts never join to the same bytes."""
+    return b"".join(len(part).to_bytes(4, 'big') + part for part in parts)
+
+
+def dictionary_id(dictionary: dict) -> int:
+    """Derives a 32-bit id from every table the decoders use.
+        Parameters:
+        dictionary – Trained dictionary without its 'id'.
+        Returns:
+        The id. Dictionaries that differ in any table get different ids,
+        so decoding with the wrong one fails check_dictionary.
+    """
+    import hashlib
+    litlen_lengths, dist_lengths = dictionary['deflate_token_lengths']
+    codes = sorted(dictionary['huffman_codes'].items())
+    digest = hashlib.sha256(_framed([
+        dictionary['content'],
+        _framed(dictionary['phrases']),
+        _framed(bytes([symbol]) + code.encode() for symbol, code in codes),
+        bytes(litlen_lengths),
+        bytes(dist_lengths),
+    ])).digest()
+    return int.from_bytes(digest[:4], 'big')
+
+
+def train_dictionary(samples: list[bytes], size: int = 4096, phrase_count: int = 1024) -> dict:
+    """Trains a shared dictionary from a sample corpus.
+        Parameters:
+        samples – Sample files.
+        size – Maximum size of the LZ77 preset window content.
+        phrase_count – Maximum number of LZW seed phrases.
+        Returns:
+        A dictionary with its 'id', the LZ77 'content', the LZW 'phrases',
+        a default Huffman code table for raw bytes ('huffman_codes') and
+        default literal/length and distance code lengths for deflate tokens
+        ('deflate_token_lengths').
+    """
+    from algorithms.deflate import compress_lz77
+    from algorithms.alphabets import token_symbols, code_lengths
+    content = train_content(samples, size)
+    phrases = train_phrases(samples, phrase_count)
+
+    byte_freq = {}
+    litlen_freq, dist_freq = token_symbols([])
+    for sample in samples:
+        for byte in sample:
+            byte_freq[byte] = byte_freq.get(byte, 0) + 1
+        sample_litlen, sample_dist = token_symbols(compress_lz77(sample, dictionary=content))
+        litlen_freq = [a + b for a, b in zip(litlen_freq, sample_litlen)]
+        dist_freq = [a + b for a, b in zip(dist_freq, sample_dist)]
+
+    dictionary = {
+        'content': content,
+        'phrases': phrases,
+        'huffman_codes': _smoothed_codes(byte_freq),
+        'deflate_token_lengths': (code_lengths([freq + 1 for freq in litlen_freq]),
+                                  code_lengths([freq + 1 for freq in dist_freq])),
+    }
+    dictionary['id'] = dictionary_id(dictionary)
+    return dictionary
+
+
+def save_dictionary(dictionary: dict, path: str) -> str:
+    """Saves a trained dictionary to a file."""
+    with open(path, "wb") as f:
+        pickle.dump(dictionary, f)
+    return path
+
+
+def check_tables(dictionary: dict) -> None:
+    """Checks that a loaded dictionary has every table the codecs use.
+        Raises DictionaryError when a table is missing or malformed (LZW phrases
+        must be distinct and at least two bytes long, the Huffman codes must
+        cover every byte value) or the tables do not match the dictionary's id.
+    """
+    from algorithms.alphabets import LITLEN_SIZE, DIST_SIZE, check_lengths
+    if not isinstance(dictionary, dict) or not isinstance(dictionary.get('id'), int):
+        raise DictionaryError("Not a dictionary")
+    if not isinstance(dictionary.get('content'), bytes):
+        raise DictionaryError("Dictionary has no LZ77 content")
+    phrases = dictionary.get('phrases')
+    if not isinstance(phrases, list) \
+            or not all(isinstance(phrase, bytes) and len(phrase) > 1 for phrase in phrases) \
+            or len(set(phrases)) != len(phrases):
+        raise DictionaryError("Dictionary LZW phrases must be distinct and at least two bytes long")
+    codes = dictionary.get('huffman_codes')
+    if not isinstance(codes, dict) or sorted(codes) != list(range(256)) \
+            or not all(isinstance(code, str) and code and not code.strip('01') for code in codes.values()):
+        raise DictionaryError("Dictionary Huffman codes must cover every byte value")
+    token_lengths = dictionary.get('deflate_token_lengths')
+    if not isinstance(token_lengths, tuple) or len(token_lengths) != 2 \
+            or not all(isinstance(lengths, list) and all(isinstance(length, int) for length in lengths)
+                       for lengths in token_lengths):
+        raise DictionaryError("Dictionary has no deflate code lengths")
+    try:
+        check_lengths(token_lengths[0], LITLEN_SIZE)
+        check_lengths(token_lengths[1], DIST_SIZE)
+    except CorruptDataError as e:
+        raise DictionaryError(f"Dictionary deflate code lengths are invalid: {e}") from e
+    if dictionary_id(dictionary) != dictionary['id']:
+        raise DictionaryError("Dictionary tables do not match its id")
+
+
+def load_dictionary(path: str) -> dict:
+    """Loads a trained dictionary from a file.
+        The file is unpickled with safe_load, so it cannot build arbitrary objects;
+        anything but a complete dictionary (see check_tables) raises DictionaryError.
+    """
+    with open(path, "rb") as f:
+        try:
+            dictionary = safe_load(f)
+        except CorruptDataError as e:
+            raise DictionaryError(f"{path} is not a dictionary file: {e}") from e
+    try:
+        check_tables(dictionary)
+    except DictionaryError as e:
+        raise DictionaryError(f"{path} is not a valid dictionary file: {e}") from e
+    return dictionary
+
+
+def check_dictionary(dict_id: int | None, dictionary: dict | None) -> None:
+    """Checks that a payload referencing dict_id is decoded with that dictionary."""
+    if dict_id is None:
+        return
+    if dictionary is None:
+        raise DictionaryError(f"Data was compressed with dictionary {dict_id:08x}, none given")
+    if dictionary['id'] != dict_id:
+        raise DictionaryError(f"Data was compressed with dictionary {dict_id:08x}, "
+                              f"got {dictionary['id']:08x}")
+
+
+def main():
+    """Trains a dictionary from sample files"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Train a shared compression dictionary.")
+    parser.add_argument("output", help="Path of the dictionary file to write")
+    parser.add_argument("samples", nargs="+", help="Sample files to train on")
+    parser.add_argument("--size", type=int, default=4096, help="Maximum LZ77 content size")
+    parser.add_argument("--phrases", type=int, default=1024, help="Maximum number of LZW phrases")
+    args = parser.parse_args()
+
+    samples = []
+    for path in args.samples:
+        with open(path, "rb") as f:
+            samples.append(f.read())
+    dictionary = train_dictionary(samples, args.size, args.phrases)
+    save_dictionary(dictionary, args.output)
+    print(f"Dictionary id          : {dictionary['id']:08x}")
+    print(f"Content size           : {len(dictionary['content'])} bytes")
+    print(f"LZW phrases            : {len(dictionary['phrases'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+ERRORS.PY
+Errors the decoders raise on corrupt input, and a pickle loader
+for the compressed formats that refuses to build arbitrary objects.
+"""
+
+import io
+import pickle
+import pickletools
+
+# the only classes a compressed file may name (older pickle protocols
+# store bytearray and set by reference)
+SAFE_CLASSES = {("builtins", "bytearray"), ("builtins", "set"), ("builtins", "frozenset")}
+# opcodes that store into the memo at an index taken from the data
+MEMO_PUTS = {"PUT", "BINPUT", "LONG_BINPUT"}
+
+
+class CorruptDataError(ValueError):
+    """Compressed data is malformed, truncated or references data it does not have."""
+
+
+class OutputLimitError(CorruptDataError):
+    """Decoding would produce more bytes than declared or allowed."""
+
+
+class DictionaryError(CorruptDataError):
+    """Data references a trained dictionary that was not given."""
+
+
+class _PlainUnpickler(pickle.Unpickler):
+    """Unpickler that only rebuilds the plain containers the codecs save."""
+    def find_class(self, module, name):
+        if (module, name) in SAFE_CLASSES:
+            return super().find_class(module, name)
+        raise CorruptDataError(f"Compressed data references {module}.{name}")
+
+
+def _check_opcodes(data: bytes) -> None:
+    """Walks the pickle opcodes without running them.
+        Raises CorruptDataError for lengths that run past the data, frames
+        larger than the rest of the data and memo indices that skip ahead
+        (the unpickler grows its memo table to any index it is given).
+        The pickler numbers memo entries in order, so valid data never skips.
+    """
+    memo_size = 0
+    try:
+        for opcode, arg, pos in pickletools.genops(io.BytesIO(data)):
+            if opcode.name in MEMO_PUTS:
+                if arg > memo_size:
+                    raise CorruptDataError(f"Memo index {arg} skips ahead of {memo_size} entries")
+                memo_size = max(memo_size, arg + 1)
+            elif opcode.name == "MEMOIZE":
+                memo_size += 1
+            elif opcode.name == "FRAME" and arg > len(data) - pos:
+                raise CorruptDataError(f"Frame of {arg} bytes does not fit the data")
+    except CorruptDataError:
+        raise
+    except Exception as e:
+        raise CorruptDataError(f"Unreadable compressed data: {e}") from e
+
+
+def safe_loads(data: bytes) -> object:
+    """Unpickles compressed data from bytes or a memoryview.
+        Returns:
+        The unpickled object, made only of ints, strings, bytes, lists,
+        tuples, dicts and sets.
+        Raises CorruptDataError for anything else or a damaged pickle.
+        The opcodes are checked first (see _check_opcodes), so damaged
+        lengths and memo indices are rejected before the unpickler
+        reserves memory for them.
+    """
+    _check_opcodes(data)
+    try:
+        return _PlainUnpickler(io.BytesIO(data)).load()
+    except CorruptDataError:
+        raise
+    except Exception as e:
+        raise CorruptDataError(f"Unreadable compressed data: {e}") from e
+
+
+def safe_load(file) -> object:
+    """safe_loads for the rest of a binary file object."""
+    return safe_loads(file.read())
+
+
+def check_output(size: int, max_output: int | None) -> None:
+    """Raises OutputLimitError when size bytes of output go over max_output."""
+    if max_output is not None and size > max_output:
+        raise OutputLimitError(f"Output of {size} bytes is over the limit of {max_output} bytes")
@@ -0,0 +1,45 @@
+"""
+FILEIO.PY
+Zero-copy file input and output helpers shared by the codecs.
+"""
+
+import mmap
+import os
+
+
+def map_file(path: str) -> memoryview:
+    """Maps a file into memory read-only instead of reading it.
+        Parameters:
+        path – Path to the file.
+        Returns:
+        A memoryview over the mapping. Indexing and iterating it yields ints
+        like bytes, and slicing it does not copy. The mapping stays valid
+        after the file is closed and is unmapped once no views are left.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def write_parts(path: str, parts: list) -> int:
+    """Writes buffers one after another without concatenating them.
+        Parameters:
+        path – Path to the output file.
+        parts – Bytes-like objects to write.
+        Returns:
+        The number of bytes written.
+    """
+    with open(path, "wb") as f:
+        f.writelines(parts)
+    return sum(len(part) for part in parts)
+
+
+def compressed_path_for(filepath: str, algorithm: str) -> str:
+    """Path that the algorithm writes the compressed file of filepath to.
+        Huffman writes next to the input, the other codecs to the working directory.
+    """
+    if algorithm == "huffman":
+        return os.path.splitext(filepath)[0] + "_huffman_compressed.bin"
+    original_filename = os.path.splitext(os.path.basename(filepath))[0]
+    return f"{original_filename}_{algorithm}_compressed.bin"
@@ -1,10 +1,19 @@
 """huffman algorithm"""
+import heapq
 import os
 import pickle
+import sys
+from algorithms.dictionary import check_dictionary
+from algorithms.errors import CorruptDataError, check_output, safe_load, safe_loads
+from algorithms.fileio import map_file
+from algorithms.rangecoder import ORDERS, range_encode, range_decode
+from algorithms.stats import CodecStats, stage
 
 class Node:
-    """_summary_
+    """Huffman tree node; char is None for inner nodes.
     """
+    __slots__ = ('char', 'freq', 'left', 'right')
+
     def __init__(self, char, freq):
         self.char = char
         self.freq = freq
@@ -30,17 +39,18 @@ def build_huffman_tree(freq: dict) -> Node:
         Returns:
         The root node of the Huffman tree.
     """
-    lst = [Node(byte, frq) for byte, frq in freq.items()]
-    lst.sort(key=lambda node: node.freq)
-    while len(lst) > 1:
-        left = lst.pop(0)
-        right = lst.pop(0)
+    heap = [(frq, order, Node(byte, frq)) for order, (byte, frq) in enumerate(freq.items())]
+    heapq.heapify(heap)
+    order = len(heap)
+    while len(heap) > 1:
+        _, _, left = heapq.heappop(heap)
+        _, _, right = heapq.heappop(heap)
         joined = Node(None, left.freq + right.freq)
         joined.left = left
         joined.right = right
-        lst.append(joined)
-        lst.sort(key=lambda node: node.freq)
-    return lst[0] if lst else None
+        heapq.heappush(heap, (joined.freq, order, joined))
+        order += 1
+    return heap[0][2] if heap else None
 
 def build_codes(root: Node) -> dict:
     """Generates the binary Huffman codes for each byte by traversing the tree.
@@ -48,8 +58,11 @@ def build_codes(root: Node) -> dict:
         root – Root node of the Huffman tree.
         Returns:
         A dictionary mapping each byte to its Huffman code as a string of '0's and '1's.
+        A tree that is a single leaf gets the code '0'.
     """
     codes = {}
+    if root is not None and root.char is not None:
+        return {root.char: "0"}
     stack = [(root, "")]
     while stack:
         node, code = stack.pop()
@@ -61,49 +74,276 @@ def build_codes(root: Node) -> dict:
                 stack.append((node.right, code + "1"))
     return codes
 
-def compress_file(filepath: str) -> str:
-    with open(filepath, "rb") as f:
-        data = f.read()
+def build_decode_tree(codes: dict) -> tuple[list[int], list[int]]:
+    """Builds the decoding tree as flat arrays instead of Node objects.
+        Parameters:
+        codes – A dictionary mapping each byte to its Huffman code.
+        Returns:
+        children – children[2 * node + bit] is the index of the child (0 if missing).
+        symbols – symbols[node] is the byte of a leaf, -1 for inner nodes.
+        Node 0 is the root.
+        Raises CorruptDataError if codes is not a prefix code of bytes.
+    """
+    if not isinstance(codes, dict):
+        raise CorruptDataError("Huffman code table is not a dictionary")
+    children = [0, 0]
+    symbols = [-1]
+    for symbol, code in codes.items():
+        if not isinstance(symbol, int) or not 0 <= symbol < 256 \
+                or not isinstance(code, str) or not code or code.strip('01'):
+            raise CorruptDataError(f"Invalid Huffman code {code!r} for {symbol!r}")
+        node = 0
+        for bit in code:
+            if symbols[node] >= 0:
+                raise CorruptDataError("Huffman codes are not a prefix code")
+            slot = 2 * node + (bit == '1')
+            if not children[slot]:
+                children[slot] = len(symbols)
+                children += (0, 0)
+                symbols.append(-1)
+            node = children[slot]
+        if symbols[node] >= 0 or children[2 * node] or children[2 * node + 1]:
+            raise CorruptDataError("Huffman codes are not a prefix code")
+        symbols[node] = symbol
+    return children, symbols
+
+def encode_bits(data: bytes, codes: dict) -> tuple[bytes, int]:
+    """Packs the codes of data into bytes, most significant bit first.
+        Parameters:
+        data – Bytes (or a memoryview) to encode.
+        codes – A dictionary mapping each byte to its Huffman code.
+        Returns:
+        The packed bits, zero padded to whole bytes, and the number of valid bits.
+        Codes are shifted into an integer bit buffer that is flushed eight
+        bytes at a time, so no bit string of the whole input is built.
+        Large inputs are read two bytes per step with a table of code pairs.
+    """
+    single = {byte: (int(code, 2), len(code)) for byte, code in codes.items()}
+    data = memoryview(data)
+    half = len(data) // 2 * 2 if len(data) >= 2 * len(single) ** 2 else 0
+    out = bytearray()
+    acc = 0
+    nbits = 0
+    if half:
+        pairs = {}
+        for first, (value1, width1) in single.items():
+            for second, (value2, width2) in single.items():
+                key = second << 8 | first if sys.byteorder == 'little' else first << 8 | second
+                pairs[key] = (value1 << width2 | value2, width1 + width2)
+        for pair in data[:half].cast('H'):
+            value, width = pairs[pair]
+            acc = (acc << width) | value
+            nbits += width
+            if nbits >= 64:
+                nbits -= 64
+                out += (acc >> nbits).to_bytes(8, 'big')
+                acc &= (1 << nbits) - 1
+    for byte in data[half:]:
+        value, width = single[byte]
+        acc = (acc << width) | value
+        nbits += width
+        if nbits >= 64:
+            nbits -= 64
+            out += (acc >> nbits).to_bytes(8, 'big')
+            acc &= (1 << nbits) - 1
+    bit_length = 8 * len(out) + nbits
+    padding = -nbits % 8
+    out += (acc << padding).to_bytes((nbits + padding) // 8, 'big')
+    return bytes(out), bit_length
+
+def decode_bits(data: bytes, bit_length: int, codes: dict) -> bytearray:
+    """Decodes the first bit_length bits of data a whole byte at a time.
+        Parameters:
+        data – Packed code bits, most significant bit first.
+        bit_length – Number of valid bits in data.
+        codes – A dictionary mapping each byte to its Huffman code.
+        Returns:
+        The decoded bytes.
+        Every (tree node, input byte) pair is walked bit by bit only once;
+        the emitted bytes and the node it ends on are remembered for reuse.
+        Raises CorruptDataError on bits that no code starts with.
+    """
+    if not 0 <= bit_length <= 8 * len(data):
+        raise CorruptDataError(f"Bit length {bit_length} does not fit in {len(data)} bytes")
+    children, symbols = build_decode_tree(codes)
+    steps = {}
 
-    freq_dict = build_frequency_dict(data)
-    tree = build_huffman_tree(freq_dict)
-    codes = build_codes(tree)
+    def step(node, byte, bits=8):
+        out = bytearray()
+        for shift in range(7, 7 - bits, -1):
+            node = children[2 * node + ((byte >> shift) & 1)]
+            if not node:
+                raise CorruptDataError("Bits do not match any Huffman code")
+            if symbols[node] >= 0:
+                out.append(symbols[node])
+                node = 0
+        return bytes(out), node
+
+    full, rest = divmod(bit_length, 8)
+    result = bytearray()
+    node = 0
+    for byte in data[:full]:
+        key = node << 8 | byte
+        entry = steps.get(key)
+        if entry is None:
+            entry = steps[key] = step(node, byte)
+        out, node = entry
+        result += out
+    if rest:
+        out, node = step(node, data[full], rest)
+        result += out
+    if node:
+        raise CorruptDataError("Huffman data ends in the middle of a code")
+    return result
+
+def encode(data: bytes, file_name: str = "", dictionary: dict | None = None,
+           stats: CodecStats | None = None, entropy: str = "huffman", order: int = 0) -> tuple:
+    """Encodes data with Huffman coding.
+        Parameters:
+        data – Bytes (or a memoryview) to encode.
+        file_name – Original file name, kept to restore its extension.
+        dictionary – Trained dictionary whose default code table is used
+        instead of storing one per file.
+        stats – Collects per-stage timings and counters if given.
+        entropy – "huffman", or "range" for the adaptive range coder
+        (which needs no code table, so the dictionary is not used).
+        order – Context order of the range coder.
+        Returns:
+        The record that is pickled as the compressed file. A range coded
+        record has ("range", order, number of bytes) in place of the code table.
+    """
+    if entropy == "range":
+        with stage(stats, 'range_coding'):
+            coded = range_encode(data, order)
+        if stats is not None:
+            stats.count('input_bytes', len(data))
+            stats.count('encoded_bits', 8 * len(coded))
+        return (coded, ("range", order, len(data)), 8 * len(coded), file_name)
 
-    encoded_bits = ''.join(codes[byte] for byte in data)
-    padding = (8 - len(encoded_bits) % 8) % 8
-    padded_bits = encoded_bits + '0' * padding
-    byte_array = bytearray(int(padded_bits[i:i+8], 2) for i in range(0, len(padded_bits), 8))
+    if dictionary is None:
+        with stage(stats, 'frequencies'):
+            freq_dict = build_frequency_dict(data)
+        with stage(stats, 'huffman_tree'):
+            tree = build_huffman_tree(freq_dict)
+        with stage(stats, 'huffman_codes'):
+            codes = build_codes(tree)
+    else:
+        codes = dictionary['huffman_codes']
 
-    file_name = os.path.basename(filepath)
+    with stage(stats, 'bit_packing'):
+        byte_array, bit_length = encode_bits(data, codes)
+    if stats is not None:
+        stats.count('input_bytes', len(data))
+        stats.count('code_table_size', len(codes))
+        stats.count('encoded_bits', bit_length)
+
+    if dictionary is None:
+        return (byte_array, codes, bit_length, file_name)
+    return (byte_array, None, bit_length, file_name, dictionary['id'])
+
+def check_record(record) -> None:
+    """Checks the shape of an unpickled record before it is decoded.
+        Raises CorruptDataError if it is not a record made by encode.
+    """
+    if not isinstance(record, tuple) or len(record) not in (4, 5):
+        raise CorruptDataError("Not a Huffman record")
+    byte_array, codes, bit_length, original_filename, *dict_id = record
+    if not isinstance(byte_array, (bytes, bytearray)) or not isinstance(bit_length, int) \
+            or bit_length < 0 or not isinstance(original_filename, str):
+        raise CorruptDataError("Invalid Huffman record")
+    if isinstance(codes, tuple):
+        if len(codes) != 3 or codes[0] != "range" or codes[1] not in ORDERS \
+                or not isinstance(codes[2], int) or codes[2] < 0:
+            raise CorruptDataError(f"Invalid entropy coder {codes!r}")
+    elif dict_id:
+        if codes is not None or not isinstance(dict_id[0], int):
+            raise CorruptDataError("Invalid dictionary reference")
+    elif not isinstance(codes, dict):
+        raise CorruptDataError("Huffman record has no code table")
+
+def decode(record: tuple, dictionary: dict | None = None,
+           stats: CodecStats | None = None, max_output: int | None = None) -> tuple[bytearray, str]:
+    """Decodes a record made by encode.
+        Parameters:
+        record – The unpickled compressed file.
+        dictionary – Trained dictionary the data was compressed with, if any.
+        stats – Collects per-stage timings and counters if given.
+        max_output – Largest number of bytes the caller accepts.
+        Returns:
+        The decoded bytes and the original file name.
+        Raises CorruptDataError (OutputLimitError over max_output) on damaged records.
+    """
+    check_record(record)
+    byte_array, codes, bit_length, original_filename, *dict_id = record
+    if isinstance(codes, tuple):
+        _, order, count = codes
+        check_output(count, max_output)
+        with stage(stats, 'range_decode'):
+            result = range_decode(byte_array, count, order)
+        if stats is not None:
+            stats.count('output_bytes', len(result))
+        return result, original_filename
+    if dict_id:
+        check_dictionary(dict_id[0], dictionary)
+        codes = dictionary['huffman_codes']
+
+    with stage(stats, 'huffman_decode'):
+        result = decode_bits(byte_array, bit_length, codes)
+    check_output(len(result), max_output)
+    if stats is not None:
+        stats.count('output_bytes', len(result))
+    return result, original_filename
+
+def compress_bytes(data: bytes, dictionary: dict | None = None,
+                   stats: CodecStats | None = None, entropy: str = "huffman", order: int = 0) -> bytes:
+    """Compresses bytes in memory into the same format as compress_file."""
+    record = encode(data, dictionary=dictionary, stats=stats, entropy=entropy, order=order)
+    with stage(stats, 'pickling'):
+        return pickle.dumps(record)
+
+def decompress_bytes(data: bytes, dictionary: dict | None = None,
+                     stats: CodecStats | None = None, max_output: int | None = None) -> bytes:
+    """Decompresses bytes made by compress_bytes or compress_file."""
+    with stage(stats, 'unpickling'):
+        record = safe_loads(data)
+    return bytes(decode(record, dictionary, stats, max_output)[0])
+
+def compress_file(filepath: str, dictionary: dict | None = None,
+                  stats: CodecStats | None = None, entropy: str = "huffman", order: int = 0) -> str:
+    """Compresses a file with Huffman coding.
+        Parameters:
+        filepath – Path to the file.
+        dictionary – Trained dictionary whose default code table is used
+        instead of storing one per file.
+        stats – Collects per-stage timings and counters if given.
+        entropy – "huffman" or "range" (see encode).
+        order – Context order of the range coder.
+        Returns:
+        The path to the compressed file.
+    """
+    record = encode(map_file(filepath), os.path.basename(filepath), dictionary, stats, entropy, order)
     output_path = os.path.splitext(filepath)[0] + "_huffman_compressed.bin"
 
-    with open(output_path, "wb") as out:
-        pickle.dump((byte_array, codes, len(encoded_bits), file_name), out)
+    with stage(stats, 'pickling'), open(output_path, "wb") as out:
+        pickle.dump(record, out)
 
     return output_path
 
-def decompress_file(filepath: str) -> str:
+def decompress_file(filepath: str, dictionary: dict | None = None,
+                    stats: CodecStats | None = None) -> str:
     """Decompresses a .huff file back to its original binary format.
         Parameters:
         filepath – Path to the .huff file.
+        dictionary – Trained dictionary the file was compressed with, if any.
+        stats – Collects per-stage timings and counters if given.
         Returns:
         The path to the restored original file.
     """
-    with open(filepath, "rb") as f:
-        byte_array, codes, bit_length, original_filename = pickle.load(f)
-
-        _, file_ext = os.path.splitext(original_filename)
-        output_path = os.path.splitext(filepath)[0] + "_huffman_compressed.bin"
-    reversed_codes = {v: k for k, v in codes.items()}
-    bit_string = ''.join(f"{byte:08b}" for byte in byte_array)
-    bit_string = bit_string[:bit_length]
-    curr = ""
-    result = bytearray()
-    for bit in bit_string:
-        curr += bit
-        if curr in reversed_codes:
-            result.append(reversed_codes[curr])
-            curr = ""
+    with stage(stats, 'unpickling'), open(filepath, "rb") as f:
+        record = safe_load(f)
+    result, original_filename = decode(record, dictionary, stats)
+
+    _, file_ext = os.path.splitext(original_filename)
     output_path = os.path.splitext(filepath)[0] + "_decompressed" + file_ext
     with open(output_path, "wb") as out:
         out.write(result)
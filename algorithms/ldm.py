@@ -0,0 +1,112 @@
+"""
+LDM.PY
+Long-distance matching: finds long repeats anywhere in the input.
+"""
+
+HASH_BASE = 257
+HASH_MASK = 0xFFFFFFFF
+COMPARE_CHUNK = 4096
+
+
+def _window_hash(data: bytes, start: int, window: int) -> int:
+    """Polynomial hash of data[start:start + window]."""
+    h = 0
+    for byte in data[start:start + window]:
+        h = (h * HASH_BASE + byte) & HASH_MASK
+    return h
+
+
+def _extend(data: bytes, pos: int, source: int) -> int:
+    """Returns the end of the match that starts at pos and copies from source."""
+    n = len(data)
+    while pos < n:
+        size = min(COMPARE_CHUNK, n - pos)
+        if data[pos:pos + size] != data[source:source + size]:
+            break
+        pos += size
+        source += size
+    while pos < n and data[pos] == data[source]:
+        pos += 1
+        source += 1
+    return pos
+
+
+def find_long_matches(data: bytes, min_length: int = 256, window: int = 64,
+                      anchor_bits: int = 6) -> list[tuple[int, int, int]]:
+    """Finds long repeats with a rolling hash over the whole input.
+        Parameters:
+        data – Bytes (or a memoryview of an mmap) to search.
+        min_length – Shortest repeat that is reported.
+        window – Number of bytes the rolling hash covers.
+        anchor_bits – Roughly one position in 2 ** anchor_bits is an anchor.
+        Returns:
+        (position, distance, length) triples in increasing position order,
+        not overlapping each other.
+        Only anchors (positions whose window hash has its top anchor_bits bits
+        clear) are remembered, so the table stays small while repeats are still
+        found at any offset and any distance.
+    """
+    n = len(data)
+    if n < window + min_length:
+        return []
+    shift = 32 - anchor_bits
+    top = pow(HASH_BASE, window, 1 << 32)
+    table = {}
+    matches = []
+    covered = 0
+    start = 0
+    h = _window_hash(data, 0, window)
+    while True:
+        if h >> shift == 0:
+            candidate = table.get(h)
+            table[h] = start
+            if candidate is not None and data[candidate:candidate + window] == data[start:start + window]:
+                match_start = start
+                source = candidate
+                while match_start > covered and source > 0 and data[match_start - 1] == data[source - 1]:
+                    match_start -= 1
+                    source -= 1
+                match_end = _extend(data, start + window, candidate + window)
+                if match_end - match_start >= min_length:
+                    matches.append((match_start, match_start - source, match_end - match_start))
+                    covered = match_end
+                    start = match_end
+                    if start + window > n:
+                        break
+                    h = _window_hash(data, start, window)
+                    continue
+        if start + window >= n:
+            break
+        h = (h * HASH_BASE + data[start + window] - data[start] * top) & HASH_MASK
+        start += 1
+    return matches
+
+
+def long_range_parse(data: bytes, parse, min_length: int = 256,
+                     stats=None) -> list[int | tuple[int, int]]:
+    """Splits data around long repeats and parses the rest with an LZ77 parser.
+        Parameters:
+        data – Input bytes.
+        parse – Callable (start, end) returning LZ77 tokens for data[start:end]
+        that may copy from anywhere before start. Spans come in increasing
+        order, so the parser can keep one match finder over all of data.
+        min_length – Shortest repeat that becomes a long token.
+        stats – CodecStats to count long matches in.
+        Returns:
+        One token list: the parser's tokens with a (distance, length) token
+        for every long repeat in between.
+    """
+    tokens = []
+    pos = 0
+    matches = find_long_matches(data, min_length)
+    for match_start, distance, length in matches:
+        if match_start > pos:
+            tokens += parse(pos, match_start)
+        tokens.append((distance, length))
+        pos = match_start + length
+    if pos < len(data) or not tokens:
+        tokens += parse(pos, len(data))
+    if stats is not None:
+        stats.count('long_matches', len(matches))
+        stats.count('long_match_bytes', sum(length for _, length in matches))
+    return tokens
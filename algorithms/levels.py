@@ -0,0 +1,25 @@
+"""
+LEVELS.PY
+Compression levels of deflate and lz77 and the entropy coder options,
+importable without loading the codecs.
+"""
+
+# deflate level: (window_size, lookahead, match finder, optimal parsing)
+DEFLATE_LEVELS = {
+    1: (1024, 15, "hash", False),
+    2: (4096, 15, "hash", False),
+    3: (1 << 20, 258, "bt", False),
+    4: (1 << 20, 258, "bt", True),
+}
+# lz77 level: (window_size, match finder)
+LZ77_LEVELS = {
+    1: (100, "scan"),
+    2: (100, "scan"),
+    3: (1 << 20, "bt"),
+    4: (1 << 20, "bt"),
+}
+DEFAULT_LEVEL = 2
+MAX_LEVEL = max(DEFLATE_LEVELS)
+# entropy stages and the context orders of the range coder
+ENTROPY_CODERS = ["huffman", "range"]
+ORDERS = (0, 1)
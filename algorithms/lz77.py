@@ -1,8 +1,24 @@
-def lz77_compress(input_data: bytes, window_size: int = 100) -> list[tuple[int, int, bytes]]:
-    """Compress input data using the LZ77 algorithm."""
+import sys
+
+from algorithms.errors import CorruptDataError, OutputLimitError, check_output
+from algorithms.stats import CodecStats
+from algorithms.matchfinder import BinaryTreeMatchFinder
+from algorithms.levels import LZ77_LEVELS as LEVELS
+
+
+def lz77_compress(input_data: bytes, window_size: int = 100, dictionary: bytes = b"",
+                  stats: CodecStats | None = None, match_finder: str = "scan",
+                  lookahead: int = 258) -> list[tuple[int, int, bytes]]:
+    """Compress input data using the LZ77 algorithm.
+    The window starts with the tail of the dictionary content, if one is given.
+    match_finder "scan" searches the window with rfind (small windows only),
+    "bt" uses a binary-tree match finder with matches of up to lookahead bytes."""
+    if match_finder == "bt":
+        return lz77_compress_bt(input_data, window_size, dictionary, stats, lookahead)
+    matches = match_bytes = chain_steps = 0
     i = 0
     compressed = []
-    window = b""
+    window = dictionary[-window_size:] if dictionary else b""
     while i < len(input_data):
         distance = 0
         length = 0
@@ -10,32 +26,93 @@ def lz77_compress(input_data: bytes, window_size: int = 100) -> list[tuple[int,
         for j in range(1, len(lookahead_buffer) + 1):
             substring = lookahead_buffer[:j]
             pos = window.rfind(substring)
+            chain_steps += 1
             if pos != -1:
                 distance = len(window) - pos
                 length = j
             else:
                 break
         if length > 0:
-            next_char = lookahead_buffer[length:length+1] if i + length < len(input_data) else b''
+            matches += 1
+            match_bytes += length
+            next_char = bytes(lookahead_buffer[length:length+1]) if i + length < len(input_data) else b''
         else:
-            next_char = input_data[i:i+1]
+            next_char = bytes(input_data[i:i+1])
         compressed.append((distance, length, next_char))
         shift = length + 1
         window += input_data[i:i+shift]
         if len(window) > window_size:
             window = window[-window_size:]
         i += shift
+    if stats is not None:
+        stats.count('input_bytes', len(input_data))
+        stats.count('matches', matches)
+        stats.count('match_bytes', match_bytes)
+        stats.count('literals', len(compressed) - matches)
+        stats.count('chain_steps', chain_steps)
     return compressed
 
-def lz77_decompress(compressed: list[tuple[int, int, bytes]]) -> bytes:
-    """Decompress LZ77-compressed data."""
-    result = bytearray()
-    for distance, length, char_bytes in compressed:
-        if distance == 0 and length == 0:
-            result.extend(char_bytes)
-        else:
-            start = len(result) - distance
-            for i in range(length):
-                result.append(result[start + i])
+def lz77_compress_bt(input_data: bytes, window_size: int = 1 << 20, dictionary: bytes = b"",
+                     stats: CodecStats | None = None, lookahead: int = 258) -> list[tuple[int, int, bytes]]:
+    """Compress input data using LZ77 with a binary-tree match finder.
+    Matches shorter than 3 bytes are emitted as plain characters."""
+    start = len(dictionary)
+    data = dictionary + input_data if dictionary else input_data
+    n = len(data)
+    finder = BinaryTreeMatchFinder(data, window_size, lookahead)
+    for j in range(start):
+        finder.find(j)
+    matches = match_bytes = 0
+    compressed = []
+    i = start
+    while i < n:
+        found = finder.find(i)
+        distance, length = found[-1] if found else (0, 0)
+        if length:
+            matches += 1
+            match_bytes += length
+        compressed.append((distance, length, bytes(data[i + length:i + length + 1])))
+        for j in range(i + 1, min(i + length + 1, n)):
+            finder.find(j)
+        i += length + 1
+    if stats is not None:
+        stats.count('input_bytes', len(input_data))
+        stats.count('matches', matches)
+        stats.count('match_bytes', match_bytes)
+        stats.count('literals', len(compressed) - matches)
+        stats.count('chain_steps', finder.steps)
+    return compressed
+
+def lz77_decompress(compressed: list[tuple[int, int, bytes]], dictionary: bytes = b"",
+                    max_output: int | None = None) -> bytes:
+    """Decompress LZ77-compressed data.
+    Raises CorruptDataError on malformed triples or distances that reach back
+    before the data, and OutputLimitError when a match would grow the output
+    past max_output."""
+    if not isinstance(compressed, list):
+        raise CorruptDataError("LZ77 data is not a list of triples")
+    result = bytearray(dictionary)
+    limit = len(dictionary) + (sys.maxsize if max_output is None else max_output)
+    try:
+        for distance, length, char_bytes in compressed:
+            if length > 0:
+                size = len(result)
+                start = size - distance
+                if not 0 <= start < size:
+                    raise CorruptDataError(f"Match distance {distance} at {size - len(dictionary)} "
+                                           f"is out of range")
+                if size + length > limit:
+                    raise OutputLimitError(f"Output is over the limit of {max_output} bytes")
+                if distance >= length:
+                    result += result[start:start + length]
+                else:
+                    for i in range(length):
+                        result.append(result[start + i])
             result.extend(char_bytes)
+    except CorruptDataError:
+        raise
+    except (TypeError, ValueError) as e:
+        raise CorruptDataError(f"Invalid LZ77 triple at {len(result) - len(dictionary)}: {e}") from e
+    del result[:len(dictionary)]
+    check_output(len(result), max_output)
     return bytes(result)
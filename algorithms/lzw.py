@@ -1,40 +1,237 @@
-def lzw_encode(data: bytes) -> list[int]:
-    table = {bytes([i]): i for i in range(256)}
-    next_code = 256
-    P = bytes([data[0]])
-    result = []
-
-    for byte in data[1:]:
-        C = bytes([byte])
-        if P + C in table:
-            P = P + C
-        else:
-            result.append(table[P])
-            table[P + C] = next_code
-            next_code += 1
-            P = C
-
-    result.append(table[P])
+import sys
+from array import array
+
+from algorithms.dictionary import check_dictionary
+from algorithms.errors import CorruptDataError, OutputLimitError
+from algorithms.stats import CodecStats
+
+SINGLE_BYTES = [bytes([i]) for i in range(256)]
+# streamed files: magic, a dictionary flag (and id), then 16-bit big-endian codes
+STREAM_MAGIC = b"LZW\x01"
+STREAM_MAX_SIZE = 1 << 16
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+def seed_phrases(phrases: list[bytes] | None) -> list[bytes]:
+    """Phrases the table starts with after the 256 single bytes.
+        Single bytes and repeats are left out, as the encoder's table keeps
+        only one code per phrase and the decoder has to assign the same codes.
+    """
+    return list(dict.fromkeys(phrase for phrase in phrases or [] if len(phrase) > 1))
+
+
+class LZWEncoder:
+    """Incremental LZW encoder that keeps its table between chunks.
+        phrases – Phrases the table starts with, after the 256 single bytes.
+        max_size – Table size at which the table starts over, so memory stays
+        bounded; None lets it grow with the input.
+        stats – Collects counters if given.
+    """
+    def __init__(self, phrases: list[bytes] | None = None, max_size: int | None = None,
+                 stats: CodecStats | None = None):
+        self.phrases = seed_phrases(phrases)
+        if max_size is not None and max_size <= 256 + len(self.phrases):
+            raise ValueError("max_size must be larger than the initial table")
+        self.max_size = max_size
+        self.stats = stats
+        self.prefix = b""
+        self.reset()
+
+    def reset(self) -> None:
+        """Starts over with the initial table."""
+        self.table = {SINGLE_BYTES[i]: i for i in range(256)}
+        for phrase in self.phrases:
+            self.table[phrase] = len(self.table)
+        self.next_code = len(self.table)
+
+    def feed(self, chunk: bytes) -> list[int]:
+        """Encodes the next chunk of input.
+            Returns:
+            The codes that are complete so far; the current phrase is held
+            back until more input or flush.
+        """
+        table = self.table
+        next_code = self.next_code
+        max_size = self.max_size
+        P = self.prefix
+        result = []
+        for byte in chunk:
+            C = SINGLE_BYTES[byte]
+            PC = P + C
+            if PC in table:
+                P = PC
+            else:
+                result.append(table[P])
+                table[PC] = next_code
+                next_code += 1
+                P = C
+                if next_code == max_size:
+                    self.reset()
+                    table = self.table
+                    next_code = self.next_code
+        self.prefix = P
+        self.next_code = next_code
+        if self.stats is not None:
+            self.stats.count('input_bytes', len(chunk))
+            self.stats.count('codes', len(result))
+        return result
+
+    def flush(self) -> list[int]:
+        """Returns the code of the phrase held back, ending the input."""
+        result = [self.table[self.prefix]] if self.prefix else []
+        self.prefix = b""
+        if self.stats is not None:
+            self.stats.count('codes', len(result))
+            self.stats.count('dictionary_size', len(self.table))
+        return result
+
+
+class LZWDecoder:
+    """Incremental LZW decoder; the counterpart of LZWEncoder.
+        phrases and max_size have to match the encoder's.
+        max_output – Total output after which decoding stops with
+        OutputLimitError (each code can add one byte more than the last,
+        so a few corrupt codes can ask for a lot of output); None for no limit.
+    """
+    def __init__(self, phrases: list[bytes] | None = None, max_size: int | None = None,
+                 stats: CodecStats | None = None, max_output: int | None = None):
+        self.phrases = seed_phrases(phrases)
+        self.max_size = max_size
+        self.stats = stats
+        self.max_output = max_output
+        self.output_size = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Starts over with the initial table."""
+        self.table = {i: SINGLE_BYTES[i] for i in range(256)}
+        for phrase in self.phrases:
+            self.table[len(self.table)] = phrase
+        self.next_code = len(self.table)
+        self.previous = None
+
+    def feed(self, codes: list[int]) -> bytes:
+        """Decodes the next codes and returns their bytes.
+            Raises CorruptDataError on a code that is not in the table yet.
+        """
+        table = self.table
+        next_code = self.next_code
+        max_size = self.max_size
+        OLD = self.previous
+        limit = None if self.max_output is None else self.max_output - self.output_size
+        result = bytearray()
+        for NEW in codes:
+            if OLD is not None and next_code + 1 == max_size:
+                # the entry the encoder added for OLD filled its table
+                self.reset()
+                table = self.table
+                next_code = self.next_code
+                OLD = None
+            if OLD is None:
+                S = table.get(NEW)
+                if S is None:
+                    raise CorruptDataError(f"Invalid LZW code: {NEW}")
+            else:
+                if NEW in table:
+                    S = table[NEW]
+                elif NEW == next_code:
+                    S = table[OLD] + table[OLD][:1]
+                else:
+                    raise CorruptDataError(f"Invalid LZW code: {NEW}")
+                table[next_code] = table[OLD] + S[:1]
+                next_code += 1
+            result += S
+            OLD = NEW
+            if limit is not None and len(result) > limit:
+                raise OutputLimitError(f"Output is over the limit of {self.max_output} bytes")
+        self.previous = OLD
+        self.next_code = next_code
+        self.output_size += len(result)
+        if self.stats is not None:
+            self.stats.count('codes', len(codes))
+            self.stats.count('output_bytes', len(result))
+        return bytes(result)
+
+
+def lzw_encode(data: bytes, phrases: list[bytes] | None = None,
+               stats: CodecStats | None = None) -> list[int]:
+    encoder = LZWEncoder(phrases, stats=stats)
+    return encoder.feed(data) + encoder.flush()
+
+
+def lzw_decode(codes: list[int], phrases: list[bytes] | None = None,
+               stats: CodecStats | None = None, max_output: int | None = None) -> bytes:
+    if not isinstance(codes, (list, array)):
+        raise CorruptDataError("LZW data is not a list of codes")
+    decoder = LZWDecoder(phrases, stats=stats, max_output=max_output)
+    try:
+        result = decoder.feed(codes)
+    except TypeError as e:
+        raise CorruptDataError(f"LZW data is not a list of codes: {e}") from e
+    if stats is not None:
+        stats.count('dictionary_size', len(decoder.table))
     return result
 
 
-def lzw_decode(codes: list[int]) -> bytes:
-    table = {i: bytes([i]) for i in range(256)}
-    next_code = 256
-    OLD = codes[0]
-    S = table[OLD]
-    result = bytearray(S)
-    C = S[:1]
-
-    for NEW in codes[1:]:
-        if NEW not in table:
-            S = table[OLD] + C
-        else:
-            S = table[NEW]
-        result += S
-        C = S[:1]
-        table[next_code] = table[OLD] + C
-        next_code += 1
-        OLD = NEW
-
-    return bytes(result)
+def _pack_codes(codes: list[int]) -> bytes:
+    packed = array('H', codes)
+    if sys.byteorder == 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_codes(data: bytes) -> array:
+    codes = array('H')
+    codes.frombytes(data)
+    if sys.byteorder == 'little':
+        codes.byteswap()
+    return codes
+
+
+def compress_stream(source, target, dictionary: dict | None = None,
+                    chunk_size: int = STREAM_CHUNK_SIZE, stats: CodecStats | None = None) -> None:
+    """Compresses a binary file object (file, pipe, socket file) into another.
+        Parameters:
+        source – Object with read(size), read until it returns b"".
+        target – Object with write(data).
+        dictionary – Trained dictionary whose phrases seed the table.
+        chunk_size – Bytes read at a time.
+        stats – Collects counters if given.
+        Memory stays bounded: the table starts over at STREAM_MAX_SIZE codes.
+    """
+    encoder = LZWEncoder(dictionary['phrases'] if dictionary else None, STREAM_MAX_SIZE, stats)
+    target.write(STREAM_MAGIC + (b"\x01" + dictionary['id'].to_bytes(4, 'big') if dictionary else b"\x00"))
+    while chunk := source.read(chunk_size):
+        target.write(_pack_codes(encoder.feed(chunk)))
+    target.write(_pack_codes(encoder.flush()))
+
+
+def decompress_stream(source, target, dictionary: dict | None = None,
+                      chunk_size: int = STREAM_CHUNK_SIZE, stats: CodecStats | None = None,
+                      max_output: int | None = None) -> None:
+    """Decompresses a stream made by compress_stream from source into target.
+        Parameters:
+        source – Object with read(size).
+        target – Object with write(data).
+        dictionary – Trained dictionary the stream was compressed with, if any.
+        chunk_size – Bytes read at a time.
+        stats – Collects counters if given.
+        max_output – Largest number of bytes to write (see LZWDecoder).
+        Raises CorruptDataError on a damaged stream.
+    """
+    if source.read(len(STREAM_MAGIC)) != STREAM_MAGIC:
+        raise CorruptDataError("Not an LZW stream")
+    flag = source.read(1)
+    if flag not in (b"\x00", b"\x01"):
+        raise CorruptDataError("Invalid LZW stream header")
+    dict_id = int.from_bytes(source.read(4), 'big') if flag == b"\x01" else None
+    check_dictionary(dict_id, dictionary)
+    decoder = LZWDecoder(dictionary['phrases'] if dictionary else None, STREAM_MAX_SIZE, stats, max_output)
+    pending = b""
+    while chunk := source.read(chunk_size):
+        chunk = pending + chunk
+        usable = len(chunk) & ~1
+        pending = chunk[usable:]
+        target.write(decoder.feed(_unpack_codes(chunk[:usable])))
+    if pending:
+        raise CorruptDataError("LZW stream ends in the middle of a code")
@@ -0,0 +1,88 @@
+"""
+MATCHFINDER.PY
+Binary-tree match finder for LZ77 with long windows.
+"""
+
+EMPTY = -1
+
+
+class BinaryTreeMatchFinder:
+    """Finds LZ77 matches in windows of a megabyte and more.
+
+    Positions whose next three bytes hash alike form a binary search tree
+    ordered by the bytes that follow them (the scheme of LZMA's bt match
+    finders). Looking a position up walks one root-to-leaf path, which is
+    roughly logarithmic in the number of earlier positions, and re-links
+    the tree so the new position becomes its root. Child links live in a
+    cyclic buffer of window_size + 1 entries, so memory is bounded by the
+    window, not by the input.
+
+    Every position has to be passed to find, in increasing order, including
+    the ones covered by a match.
+    """
+    def __init__(self, data: bytes, window_size: int = 1 << 20, max_length: int = 258,
+                 cut_value: int = 32):
+        self.data = data
+        self.window_size = window_size
+        self.max_length = max_length
+        self.cut_value = cut_value
+        self.cyclic_size = window_size + 1
+        self.son = [EMPTY] * (2 * self.cyclic_size)
+        self.heads = {}
+        self.steps = 0
+
+    def find(self, pos: int) -> list[tuple[int, int]]:
+        """Inserts pos into its tree and returns its matches.
+            Parameters:
+            pos – Position in data.
+            Returns:
+            (distance, length) pairs of length 3 or more, each one longer
+            than the one before it.
+        """
+        data = self.data
+        n = len(data)
+        if pos + 3 > n:
+            return []
+        key = (data[pos] << 16) | (data[pos + 1] << 8) | data[pos + 2]
+        cur_match = self.heads.get(key, EMPTY)
+        self.heads[key] = pos
+
+        son = self.son
+        cyclic_size = self.cyclic_size
+        len_limit = min(self.max_length, n - pos)
+        cyclic_pos = pos % cyclic_size
+        ptr0 = 2 * cyclic_pos + 1
+        ptr1 = 2 * cyclic_pos
+        len0 = len1 = 0
+        best_len = 2
+        matches = []
+        cut = self.cut_value
+        while True:
+            delta = pos - cur_match
+            if cur_match == EMPTY or cut == 0 or delta > self.window_size:
+                son[ptr0] = son[ptr1] = EMPTY
+                break
+            cut -= 1
+            self.steps += 1
+            pair = 2 * (cur_match % cyclic_size)
+            length = min(len0, len1)
+            while length < len_limit and data[cur_match + length] == data[pos + length]:
+                length += 1
+            if length > best_len:
+                best_len = length
+                matches.append((delta, length))
+            if length == len_limit:
+                son[ptr1] = son[pair]
+                son[ptr0] = son[pair + 1]
+                break
+            if data[cur_match + length] < data[pos + length]:
+                son[ptr1] = cur_match
+                ptr1 = pair + 1
+                cur_match = son[ptr1]
+                len1 = length
+            else:
+                son[ptr0] = cur_match
+                ptr0 = pair
+                cur_match = son[ptr0]
+                len0 = length
+        return matches
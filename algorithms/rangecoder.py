@@ -0,0 +1,295 @@
+"""
+RANGECODER.PY
+Adaptive binary range coder, an entropy stage alternative to Huffman.
+"""
+
+from algorithms.alphabets import MIN_MATCH, END_OF_BLOCK, LITLEN_SIZE, DIST_SIZE, bucket, bucket_base
+from algorithms.errors import CorruptDataError
+from algorithms.levels import ORDERS
+
+PROB_BITS = 11
+PROB_INIT = 1 << (PROB_BITS - 1)
+MOVE_BITS = 5
+TOP = 1 << 24
+# token models: literal/length symbols in a 9-bit tree, distance symbols in a
+# 7-bit tree per length context, the low ALIGN_BITS of long distances in a tree
+LITLEN_BITS = 9
+DIST_BITS = 7
+LENGTH_CONTEXTS = 4
+ALIGN_BITS = 4
+# order 1 token models only look at the top bits of the last literal (LZMA's lc=3)
+LITERAL_CONTEXT_BITS = 3
+
+
+def _check_order(order: int) -> None:
+    if order not in ORDERS:
+        raise ValueError(f"Unknown context order: {order}")
+
+
+def range_encode(data: bytes, order: int = 0) -> bytes:
+    """Encodes bytes with an adaptive range coder.
+        Parameters:
+        data – Bytes (or a memoryview) to encode.
+        order – 0 to model every byte on its own, 1 to model it
+        after the byte before it.
+        Returns:
+        The coded bytes. The decoder also needs len(data) and order.
+        Every byte is coded as 8 binary decisions down a bit tree (as in LZMA),
+        each with its own adaptive probability, so a symbol can cost much less
+        than the whole bit Huffman spends on it.
+    """
+    _check_order(order)
+    probs = [PROB_INIT] * (256 << (8 * order))
+    coder = RangeEncoder()
+    base = 0
+    for byte in data:
+        coder.encode_tree(probs, base, 8, byte)
+        if order:
+            base = byte << 8
+    return coder.finish()
+
+
+def range_decode(data: bytes, count: int, order: int = 0) -> bytearray:
+    """Decodes bytes made by range_encode.
+        Parameters:
+        data – The coded bytes.
+        count – Number of bytes to decode.
+        order – Context order the data was encoded with.
+        Returns:
+        The decoded bytes.
+        Raises CorruptDataError when the data runs out before count bytes,
+        so a damaged count cannot keep the decoder going.
+    """
+    _check_order(order)
+    probs = [PROB_INIT] * (256 << (8 * order))
+    out = bytearray()
+    if not count:
+        return out
+    coder = RangeDecoder(data)
+    base = 0
+    for _ in range(count):
+        byte = coder.decode_tree(probs, base, 8)
+        out.append(byte)
+        if order:
+            base = byte << 8
+    return out
+
+
+class RangeEncoder:
+    """Codes binary decisions with adaptive probabilities (the LZMA range coder).
+    The probabilities are kept by the caller in plain lists, so one encoder
+    can drive any number of models.
+    """
+    def __init__(self):
+        self.low = 0
+        self.range = 0xFFFFFFFF
+        self.cache = 0
+        self.cache_size = 1
+        self.out = bytearray()
+
+    def _shift_low(self) -> None:
+        low = self.low
+        if low < 0xFF000000 or low > 0xFFFFFFFF:
+            carry = low >> 32
+            self.out.append((self.cache + carry) & 0xFF)
+            if self.cache_size > 1:
+                self.out += bytes([(0xFF + carry) & 0xFF]) * (self.cache_size - 1)
+            self.cache_size = 0
+            self.cache = (low >> 24) & 0xFF
+        self.cache_size += 1
+        self.low = (low & 0x00FFFFFF) << 8
+
+    def encode_tree(self, probs: list[int], base: int, bits: int, value: int) -> None:
+        """Codes the bits of value, highest first, with the bit tree at probs[base:base + 2 ** bits]."""
+        node = 1
+        low = self.low
+        rng = self.range
+        for shift in range(bits - 1, -1, -1):
+            bit = (value >> shift) & 1
+            i = base | node
+            p = probs[i]
+            bound = (rng >> PROB_BITS) * p
+            if bit:
+                low += bound
+                rng -= bound
+                probs[i] = p - (p >> MOVE_BITS)
+            else:
+                rng = bound
+                probs[i] = p + (((1 << PROB_BITS) - p) >> MOVE_BITS)
+            node = (node << 1) | bit
+            if rng < TOP:
+                rng <<= 8
+                self.low = low
+                self._shift_low()
+                low = self.low
+        self.low = low
+        self.range = rng
+
+    def encode_direct(self, value: int, bits: int) -> None:
+        """Codes the bits of value, highest first, each with probability one half."""
+        for shift in range(bits - 1, -1, -1):
+            self.range >>= 1
+            if (value >> shift) & 1:
+                self.low += self.range
+            if self.range < TOP:
+                self.range <<= 8
+                self._shift_low()
+
+    def finish(self) -> bytes:
+        """Flushes the coder and returns everything it wrote."""
+        for _ in range(5):
+            self._shift_low()
+        return bytes(self.out)
+
+
+class RangeDecoder:
+    """Decodes what RangeEncoder wrote, given the same models in the same order."""
+    def __init__(self, data: bytes):
+        if len(data) < 5:
+            raise CorruptDataError("Range coded data is too short")
+        self.data = data
+        self.code = int.from_bytes(data[1:5], 'big')
+        self.pos = 5
+        self.range = 0xFFFFFFFF
+
+    def _normalize(self) -> None:
+        if self.pos >= len(self.data):
+            raise CorruptDataError("Range coded data ended early")
+        self.range <<= 8
+        self.code = (self.code << 8) | self.data[self.pos]
+        self.pos += 1
+
+    def decode_tree(self, probs: list[int], base: int, bits: int) -> int:
+        """Decodes a value coded by RangeEncoder.encode_tree."""
+        node = 1
+        limit = 1 << bits
+        rng = self.range
+        code = self.code
+        while node < limit:
+            i = base | node
+            p = probs[i]
+            bound = (rng >> PROB_BITS) * p
+            if code < bound:
+                rng = bound
+                probs[i] = p + (((1 << PROB_BITS) - p) >> MOVE_BITS)
+                node <<= 1
+            else:
+                code -= bound
+                rng -= bound
+                probs[i] = p - (p >> MOVE_BITS)
+                node = (node << 1) | 1
+            if rng < TOP:
+                self.range = rng
+                self.code = code
+                self._normalize()
+                rng = self.range
+                code = self.code
+        self.range = rng
+        self.code = code
+        return node - limit
+
+    def decode_direct(self, bits: int) -> int:
+        """Decodes a value coded by RangeEncoder.encode_direct."""
+        value = 0
+        for _ in range(bits):
+            self.range >>= 1
+            bit = self.code >= self.range
+            if bit:
+                self.code -= self.range
+            value = (value << 1) | bit
+            if self.range < TOP:
+                self._normalize()
+        return value
+
+
+def _token_models(order: int) -> tuple[list[int], list[int], list[int], list[int]]:
+    """Fresh probabilities of the literal/length, distance, short distance extra and align models."""
+    return ([PROB_INIT] * ((1 + (order << LITERAL_CONTEXT_BITS)) << LITLEN_BITS),
+            [PROB_INIT] * (LENGTH_CONTEXTS << DIST_BITS),
+            [PROB_INIT] * (DIST_SIZE << ALIGN_BITS),
+            [PROB_INIT] * (1 << ALIGN_BITS))
+
+
+def range_encode_tokens(tokens: list[int | tuple[int, int]], order: int = 0) -> bytes:
+    """Range codes LZ77 tokens with the deflate alphabets instead of Huffman codes.
+        Parameters:
+        tokens – Literals and (distance, length) matches.
+        order – 0 to model literal/length symbols on their own, 1 to model
+        them after the top bits of the last literal.
+        Returns:
+        The coded tokens, ended by the end of block symbol.
+        Distance symbols are modelled per length bucket; the extra bits of
+        short distances are adaptive, of long ones only the lowest ALIGN_BITS.
+    """
+    _check_order(order)
+    litlen, dist, short, align = _token_models(order)
+    coder = RangeEncoder()
+    context = 0
+    for token in tokens:
+        if isinstance(token, tuple):
+            distance, length = token
+            symbol, extra, value = bucket(length - MIN_MATCH)
+            coder.encode_tree(litlen, context, LITLEN_BITS, 257 + symbol)
+            coder.encode_direct(value, extra)
+            dist_context = min(symbol, LENGTH_CONTEXTS - 1) << DIST_BITS
+            symbol, extra, value = bucket(distance - 1)
+            coder.encode_tree(dist, dist_context, DIST_BITS, symbol)
+            if extra < ALIGN_BITS:
+                coder.encode_tree(short, symbol << ALIGN_BITS, extra, value)
+            else:
+                coder.encode_direct(value >> ALIGN_BITS, extra - ALIGN_BITS)
+                coder.encode_tree(align, 0, ALIGN_BITS, value & ((1 << ALIGN_BITS) - 1))
+        else:
+            coder.encode_tree(litlen, context, LITLEN_BITS, token)
+            if order:
+                context = (1 + (token >> (8 - LITERAL_CONTEXT_BITS))) << LITLEN_BITS
+    coder.encode_tree(litlen, context, LITLEN_BITS, END_OF_BLOCK)
+    return coder.finish()
+
+
+def range_decode_tokens(data: bytes, order: int = 0, size: int | None = None) -> list[int | tuple[int, int]]:
+    """Decodes tokens made by range_encode_tokens, up to the end of block symbol.
+        Parameters:
+        data – The coded tokens.
+        order – Context order the tokens were coded with.
+        size – Number of bytes the tokens decode to, if known.
+        Returns:
+        Literals and (distance, length) matches.
+        Raises CorruptDataError on symbols outside the alphabets, data that
+        runs out before the end of block and tokens that would decode to
+        more than size bytes.
+    """
+    _check_order(order)
+    litlen, dist, short, align = _token_models(order)
+    coder = RangeDecoder(data)
+    tokens = []
+    context = 0
+    total = 0
+    while True:
+        symbol = coder.decode_tree(litlen, context, LITLEN_BITS)
+        if symbol < END_OF_BLOCK:
+            tokens.append(symbol)
+            total += 1
+            if order:
+                context = (1 + (symbol >> (8 - LITERAL_CONTEXT_BITS))) << LITLEN_BITS
+        elif symbol == END_OF_BLOCK:
+            return tokens
+        elif symbol >= LITLEN_SIZE:
+            raise CorruptDataError("Invalid literal/length symbol")
+        else:
+            length, extra = bucket_base(symbol - 257)
+            length += coder.decode_direct(extra) + MIN_MATCH
+            dist_context = min(symbol - 257, LENGTH_CONTEXTS - 1) << DIST_BITS
+            symbol = coder.decode_tree(dist, dist_context, DIST_BITS)
+            if symbol >= DIST_SIZE:
+                raise CorruptDataError("Invalid distance symbol")
+            distance, extra = bucket_base(symbol)
+            if extra < ALIGN_BITS:
+                distance += coder.decode_tree(short, symbol << ALIGN_BITS, extra)
+            else:
+                distance += coder.decode_direct(extra - ALIGN_BITS) << ALIGN_BITS
+                distance += coder.decode_tree(align, 0, ALIGN_BITS)
+            tokens.append((distance + 1, length))
+            total += length
+        if size is not None and total > size:
+            raise CorruptDataError(f"Tokens decode to more than {size} bytes")
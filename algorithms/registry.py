@@ -0,0 +1,81 @@
+"""
+REGISTRY.PY
+In-memory compress/decompress functions of every algorithm.
+Codec modules are imported on first use, so entry points only pay
+for the algorithm they run.
+"""
+
+import importlib
+import pickle
+
+from algorithms.errors import safe_loads
+from algorithms.levels import DEFAULT_LEVEL, LZ77_LEVELS
+from algorithms.stats import CodecStats, stage
+
+CODECS = {
+    "huffman": "algorithms.huffman",
+    "deflate": "algorithms.deflate",
+    "lzw": "algorithms.lzw",
+    "lz77": "algorithms.lz77",
+}
+ALGORITHMS = list(CODECS)
+
+
+def load_codec(algorithm: str):
+    """Imports and returns the module that implements algorithm."""
+    if algorithm not in CODECS:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+    return importlib.import_module(CODECS[algorithm])
+
+
+def compress_bytes(algorithm: str, data: bytes, stats: CodecStats | None = None,
+                   level: int = DEFAULT_LEVEL) -> bytes:
+    """Compresses data in memory into the same format the CLI saves.
+        Parameters:
+        algorithm – Name of the algorithm.
+        data – Bytes to compress.
+        stats – Collects per-stage timings and counters if given.
+        level – Compression level, used by deflate and lz77.
+        Returns:
+        The compressed bytes.
+    """
+    codec = load_codec(algorithm)
+    if algorithm == "huffman":
+        return codec.compress_bytes(data, stats=stats)
+    if algorithm == "deflate":
+        return codec.deflate_bytes(data, stats=stats, level=level)
+    if algorithm == "lzw":
+        with stage(stats, 'lzw'):
+            compressed = codec.lzw_encode(data, stats=stats)
+    else:
+        with stage(stats, 'lz77'):
+            window_size, match_finder = LZ77_LEVELS[level]
+            compressed = codec.lz77_compress(data, window_size, stats=stats, match_finder=match_finder)
+    with stage(stats, 'pickling'):
+        return pickle.dumps(compressed)
+
+
+def decompress_bytes(algorithm: str, data: bytes, stats: CodecStats | None = None,
+                     max_output: int | None = None) -> bytes:
+    """Decompresses bytes made by compress_bytes.
+        Parameters:
+        algorithm – Name of the algorithm.
+        data – Compressed bytes, possibly untrusted.
+        stats – Collects per-stage timings and counters if given.
+        max_output – Largest output accepted, None for no limit.
+        Returns:
+        The original bytes.
+        Raises CorruptDataError (errors.py) on damaged data and
+        OutputLimitError when the output would go over max_output.
+    """
+    codec = load_codec(algorithm)
+    if algorithm == "huffman":
+        return codec.decompress_bytes(data, stats=stats, max_output=max_output)
+    if algorithm == "deflate":
+        return codec.inflate_bit_decompress(data, stats=stats, max_output=max_output)
+    with stage(stats, 'unpickling'):
+        compressed = safe_loads(data)
+    with stage(stats, algorithm):
+        if algorithm == "lzw":
+            return codec.lzw_decode(compressed, stats=stats, max_output=max_output)
+        return codec.lz77_decompress(compressed, max_output=max_output)
@@ -0,0 +1,86 @@
+"""
+STATS.PY
+Per-stage timers, counters and an opt-in profiler for the codecs.
+"""
+
+from contextlib import contextmanager, nullcontext
+from time import perf_counter_ns
+
+
+class CodecStats:
+    """Timings and counters collected while a codec runs.
+        stages – Stage name mapped to the nanoseconds spent in it.
+        counters – Counter name mapped to its value (matches, literals, ...).
+    """
+    def __init__(self, algorithm: str, operation: str = "compress"):
+        self.algorithm = algorithm
+        self.operation = operation
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Adds the time spent inside the with block to the named stage."""
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + perf_counter_ns() - start
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Adds value to the named counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        """Returns the stats as plain data, with derived averages."""
+        counters = dict(self.counters)
+        if counters.get('matches'):
+            counters['avg_match_length'] = round(counters.get('match_bytes', 0) / counters['matches'], 2)
+        return {
+            'algorithm': self.algorithm,
+            'operation': self.operation,
+            'total_ns': sum(self.stages.values()),
+            'stages_ns': dict(self.stages),
+            'counters': counters,
+        }
+
+    def report(self) -> str:
+        """Formats the stats as aligned lines for the CLI."""
+        data = self.as_dict()
+        total = data['total_ns'] or 1
+        lines = [f"{self.operation} stats ({self.algorithm})"]
+        for name, spent in data['stages_ns'].items():
+            lines.append(f"  {name:<21}: {spent / 1e6:10.3f} ms {100 * spent / total:5.1f}%")
+        for name, value in data['counters'].items():
+            lines.append(f"  {name:<21}: {value}")
+        return "\n".join(lines)
+
+
+def stage(stats: CodecStats | None, name: str):
+    """Times a stage when stats are collected, does nothing otherwise."""
+    return stats.stage(name) if stats is not None else nullcontext()
+
+
+@contextmanager
+def profiled(enabled: bool = True, limit: int = 25, sort: str = "cumulative"):
+    """Runs the with block under cProfile and prints the top functions.
+        Parameters:
+        enabled – Profile only when True, so callers can pass a CLI flag.
+        limit – Number of functions to print.
+        sort – pstats sort key.
+    """
+    if not enabled:
+        yield
+        return
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+        print(out.getvalue())
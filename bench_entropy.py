@@ -0,0 +1,63 @@
+"""entropy stage benchmark
+
+Compares Huffman coding with the range coder (order 0 and 1) on the raw
+bytes of every file (huffman) and on the LZ77 tokens of deflate:
+
+    python3 bench_entropy.py static/*
+"""
+import argparse
+import glob
+import os
+import pickle
+from time import perf_counter
+
+from algorithms.huffman import encode, decode
+from algorithms.deflate import deflate_bytes, inflate_bit_decompress
+
+CODERS = [("huffman", 0), ("range", 0), ("range", 1)]
+
+
+def measure(data, entropy, order, stage_name):
+    """Returns the compressed size and encode/decode throughput in MB/s"""
+    start = perf_counter()
+    if stage_name == "raw":
+        record = encode(data, entropy=entropy, order=order)
+        encoded = perf_counter()
+        result, _ = decode(record)
+        size = len(pickle.dumps(record))
+    else:
+        compressed = deflate_bytes(data, entropy=entropy, order=order)
+        encoded = perf_counter()
+        result = inflate_bit_decompress(compressed)
+        size = len(compressed)
+    decoded = perf_counter()
+    if result != data:
+        raise RuntimeError(f"{entropy} order {order} did not round-trip")
+    mb = len(data) / 1e6
+    return size, mb / max(encoded - start, 1e-9), mb / max(decoded - encoded, 1e-9)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the entropy coders.")
+    parser.add_argument("files", nargs="*", help="Files to benchmark (default: static/*)")
+    args = parser.parse_args()
+    files = args.files or sorted(glob.glob(os.path.join(os.path.dirname(__file__) or ".", "static", "*")))
+
+    print(f"{'file':<24}{'stage':<8}{'coder':<10}{'bytes in':>10}{'bytes out':>11}"
+          f"{'ratio':>8}{'enc MB/s':>10}{'dec MB/s':>10}")
+    for path in files:
+        with open(path, "rb") as f:
+            raw = f.read()
+        if not raw:
+            continue
+        for stage_name in ("raw", "deflate"):
+            for entropy, order in CODERS:
+                size, enc, dec = measure(raw, entropy, order, stage_name)
+                coder = entropy if entropy == "huffman" else f"{entropy}-o{order}"
+                print(f"{os.path.basename(path)[:23]:<24}{stage_name:<8}{coder:<10}{len(raw):>10}{size:>11}"
+                      f"{len(raw) / max(size, 1):>8.2f}{enc:>10.2f}{dec:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""startup benchmark
+
+Measures how long the headless CLI takes to import, with python -X importtime,
+and fails when it goes over budget or loads modules it should only load on use.
+The budget is a multiple of the import time of argparse, which the CLI needs
+anyway, so it holds on slow and fast machines alike:
+
+    python3 bench_startup.py --budget 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# modules the CLI must not import before it knows the algorithm it runs
+LAZY_MODULES = [
+    "algorithms.huffman", "algorithms.deflate", "algorithms.lzw", "algorithms.lz77",
+    "algorithms.alphabets", "algorithms.rangecoder", "algorithms.matchfinder", "algorithms.ldm",
+    "algorithms.cache", "cProfile", "pstats", "hashlib",
+    "customtkinter", "PIL", "matplotlib", "numpy",
+]
+
+
+def import_time(module, runs):
+    """Best cumulative import time of module over runs, in ms, and its slowest imports"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=ROOT, capture_output=True, text=True, check=True)
+        rows = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            own, total, name = line[len("import time:"):].split("|")
+            if own.strip().isdigit():
+                rows.append((int(own), int(total), name.strip()))
+        total = next(total for _, total, name in rows if name == module) / 1000
+        if best is None or total < best[0]:
+            best = (total, sorted(rows, reverse=True)[:10])
+    return best
+
+
+def loaded_lazy_modules(module):
+    """Modules from LAZY_MODULES that importing module loads"""
+    code = (f"import sys, {module}\n"
+            f"print('\\n'.join(m for m in {LAZY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [name for name in result.stdout.split() if name != module]
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Check the import time of the CLI.")
+    parser.add_argument("--module", default="main_argparse", help="Entry point module to import")
+    parser.add_argument("--budget", type=float, default=3.0,
+                        help="Allowed import time, as a multiple of the import time of argparse")
+    parser.add_argument("--runs", type=int, default=5, help="Runs to take the best time of")
+    args = parser.parse_args()
+
+    total, slowest = import_time(args.module, args.runs)
+    baseline, _ = import_time("argparse", args.runs)
+    limit = args.budget * baseline
+    print(f"Import time of {args.module}: {total:.1f} ms "
+          f"(budget {args.budget:g} x argparse {baseline:.1f} ms = {limit:.1f} ms)")
+    print("Slowest imports (self ms, cumulative ms):")
+    for own, cumulative, name in slowest:
+        print(f"  {name:<32}{own / 1000:8.2f}{cumulative / 1000:8.2f}")
+
+    failed = False
+    eager = loaded_lazy_modules(args.module)
+    if eager:
+        print(f"Imported eagerly: {', '.join(eager)}")
+        failed = True
+    if total > limit:
+        print("Over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
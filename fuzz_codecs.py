@@ -0,0 +1,196 @@
+"""codec fuzzer
+
+Round-trips random inputs through every codec and configuration, then feeds
+the decoders damaged copies of the compressed data (flipped bits, cut off
+tails, inserted and overwritten bytes). Decoding damaged data may return
+bytes or raise CorruptDataError; any other exception, or a decoder that runs
+longer than --timeout, is a failure:
+
+    python3 fuzz_codecs.py --iterations 200 --seed 1
+"""
+import argparse
+import io
+import os
+import pickle
+import random
+import signal
+import sys
+import traceback
+from time import perf_counter
+
+from algorithms.errors import CorruptDataError, safe_loads
+from algorithms.levels import LZ77_LEVELS
+from algorithms.registry import load_codec
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class DecoderTimeout(Exception):
+    """A decoder ran longer than allowed"""
+
+
+def configurations():
+    """(name, compress, decompress) of every codec setup that is fuzzed"""
+    huffman = load_codec("huffman")
+    deflate = load_codec("deflate")
+    lzw = load_codec("lzw")
+    lz77 = load_codec("lz77")
+
+    def lzw_stream(data):
+        target = io.BytesIO()
+        lzw.compress_stream(io.BytesIO(data), target, chunk_size=97)
+        return target.getvalue()
+
+    def lzw_unstream(data, max_output):
+        target = io.BytesIO()
+        lzw.decompress_stream(io.BytesIO(data), target, chunk_size=97, max_output=max_output)
+        return target.getvalue()
+
+    def pickled(encode, decode):
+        return (lambda data: pickle.dumps(encode(data)),
+                lambda data, max_output: decode(safe_loads(data), max_output))
+
+    setups = [
+        ("huffman", lambda data: huffman.compress_bytes(data),
+         lambda data, max_output: huffman.decompress_bytes(data, max_output=max_output)),
+        ("huffman-range1", lambda data: huffman.compress_bytes(data, entropy="range", order=1),
+         lambda data, max_output: huffman.decompress_bytes(data, max_output=max_output)),
+        ("lzw", *pickled(lzw.lzw_encode, lambda codes, max_output: lzw.lzw_decode(codes, max_output=max_output))),
+        ("lzw-stream", lzw_stream, lzw_unstream),
+    ]
+    for level, (window_size, match_finder) in sorted(LZ77_LEVELS.items()):
+        setups.append((f"lz77-{level}", *pickled(
+            lambda data, w=window_size, m=match_finder: lz77.lz77_compress(data, w, match_finder=m),
+            lambda triples, max_output: lz77.lz77_decompress(triples, max_output=max_output))))
+    for level in sorted(deflate.LEVELS):
+        setups.append((f"deflate-{level}", lambda data, level=level: deflate.deflate_bytes(data, level=level),
+                       lambda data, max_output: deflate.inflate_bit_decompress(data, max_output=max_output)))
+    setups += [
+        ("deflate-long", lambda data: deflate.deflate_bytes(data, long_range=True),
+         lambda data, max_output: deflate.inflate_bit_decompress(data, max_output=max_output)),
+        ("deflate-range0", lambda data: deflate.deflate_bytes(data, entropy="range"),
+         lambda data, max_output: deflate.inflate_bit_decompress(data, max_output=max_output)),
+        ("deflate-range1", lambda data: deflate.deflate_bytes(data, entropy="range", order=1),
+         lambda data, max_output: deflate.inflate_bit_decompress(data, max_output=max_output)),
+    ]
+    return setups
+
+
+def random_input(rng, max_size, samples):
+    """Random bytes of one of several shapes: noise, few symbols, runs, repeats, text"""
+    size = rng.randint(0, max_size)
+    shape = rng.choice(["noise", "alphabet", "runs", "repeat", "sample", "empty"])
+    if shape == "noise":
+        return rng.randbytes(size)
+    if shape == "alphabet":
+        symbols = rng.randbytes(rng.randint(1, 4))
+        return bytes(rng.choice(symbols) for _ in range(size))
+    if shape == "runs":
+        out = bytearray()
+        while len(out) < size:
+            out += bytes([rng.randrange(256)]) * rng.randint(1, 300)
+        return bytes(out[:size])
+    if shape == "repeat":
+        unit = rng.randbytes(rng.randint(1, 40))
+        return (unit * (size // len(unit) + 1))[:size]
+    if shape == "sample" and samples:
+        start = rng.randrange(len(samples))
+        return samples[start:start + size]
+    return b""
+
+
+def mutate(rng, data):
+    """A damaged copy of data"""
+    data = bytearray(data)
+    kind = rng.choice(["flip", "truncate", "insert", "overwrite", "delete"])
+    if not data or kind == "insert":
+        pos = rng.randint(0, len(data))
+        data[pos:pos] = rng.randbytes(rng.randint(1, 8))
+    elif kind == "flip":
+        for _ in range(rng.randint(1, 4)):
+            pos = rng.randrange(len(data))
+            data[pos] ^= 1 << rng.randrange(8)
+    elif kind == "truncate":
+        del data[rng.randrange(len(data)):]
+    elif kind == "overwrite":
+        pos = rng.randrange(len(data))
+        data[pos:pos + 4] = rng.randbytes(4)
+    else:
+        pos = rng.randrange(len(data))
+        del data[pos:pos + rng.randint(1, 8)]
+    return bytes(data), kind
+
+
+def run_limited(function, timeout, *args):
+    """Calls function, raising DecoderTimeout after timeout seconds (where SIGALRM exists)"""
+    if not hasattr(signal, "SIGALRM"):
+        return function(*args)
+
+    def expire(signum, frame):
+        raise DecoderTimeout(f"no result after {timeout} s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return function(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Fuzz the codecs with random and corrupt inputs.")
+    parser.add_argument("--iterations", type=int, default=100, help="Random inputs per codec")
+    parser.add_argument("--mutants", type=int, default=20, help="Damaged copies per compressed input")
+    parser.add_argument("--max-size", type=int, default=4096, help="Largest random input in bytes")
+    parser.add_argument("--seed", type=int, default=None, help="Seed to reproduce a run")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds a decoder may take per input")
+    parser.add_argument("--codecs", nargs="*", default=None, help="Only fuzz setups starting with these names")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 32)
+    with open(os.path.join(ROOT, "README.md"), "rb") as f:
+        samples = f.read()
+    setups = [setup for setup in configurations()
+              if not args.codecs or setup[0].startswith(tuple(args.codecs))]
+    print(f"Seed {seed}, {len(setups)} setups, {args.iterations} inputs each")
+
+    failures = 0
+    for name, compress, decompress in setups:
+        rng = random.Random(f"{seed}-{name}")
+        rejected = accepted = 0
+        start = perf_counter()
+        for iteration in range(args.iterations):
+            data = random_input(rng, args.max_size, samples)
+            # a generous cap: damaged data must not decode to much more than the input
+            max_output = 16 * len(data) + 1024
+            try:
+                compressed = compress(data)
+                restored = run_limited(decompress, args.timeout, compressed, None)
+                if restored != data:
+                    raise AssertionError(f"round trip changed {len(data)} bytes")
+            except Exception:
+                failures += 1
+                print(f"FAIL {name} iteration {iteration}: round trip\n{traceback.format_exc()}")
+                continue
+            for _ in range(args.mutants):
+                damaged, kind = mutate(rng, compressed)
+                try:
+                    run_limited(decompress, args.timeout, damaged, max_output)
+                    accepted += 1
+                except CorruptDataError:
+                    rejected += 1
+                except Exception as e:
+                    failures += 1
+                    print(f"FAIL {name} iteration {iteration}: {kind} raised {type(e).__name__}: {e}")
+                    if not isinstance(e, DecoderTimeout):
+                        traceback.print_exc()
+        print(f"{name:<16}{args.iterations:>6} round trips, {rejected:>6} damaged rejected, "
+              f"{accepted:>6} decoded anyway  {perf_counter() - start:6.1f} s")
+    print(f"{failures} failures" if failures else "No failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,18 @@
 """argparse module"""
 import argparse
 import os
-import tempfile
 import pickle
-from algorithms.huffman import compress_file as huffman_compress, \
-    decompress_file as huffman_decompress
-from algorithms.deflate import deflate_bit_compress as deflate_compress, \
-    inflate_bit_decompress as deflate_decompress
-from algorithms.lzw import lzw_encode as lzw_compress, lzw_decode as lzw_decompress
-from algorithms.lz77 import lz77_compress, lz77_decompress
+from algorithms.registry import ALGORITHMS, load_codec
+from algorithms.levels import DEFAULT_LEVEL, DEFLATE_LEVELS as LEVELS, LZ77_LEVELS, ENTROPY_CODERS, ORDERS
+from algorithms.auto import choose_algorithm, OBJECTIVES
+from algorithms.dictionary import load_dictionary, check_dictionary
+from algorithms.errors import CorruptDataError, safe_load
+from algorithms.stats import CodecStats, stage, profiled
+from algorithms.fileio import map_file, write_parts, compressed_path_for
 
 def readfile(path):
-    """Read the file content"""
-    with open(path, "rb") as f:
-        data = f.read()
-    return data
+    """Map the file content into memory without copying it"""
+    return map_file(path)
 
 def get_file_size(path):
     """Get the size of the file"""
@@ -26,16 +24,30 @@ def calc_compression_ratio(original_size, compressed_size):
 
 def check_lossless(original_path, decompressed_path):
     """Check if the decompression is lossless"""
-    with open(original_path, 'rb') as f1, open(decompressed_path, 'rb') as f2:
-        return f1.read() == f2.read()
+    return map_file(original_path) == map_file(decompressed_path)
 
-def save_compressed_file(data, algorithm, original_filename):
+def save_compressed_file(data, algorithm, original_filename, stats=None):
     """Saves the compressed data to a file"""
     compressed_filename = f"{original_filename}_{algorithm}_compressed.bin"
-    with open(compressed_filename, "wb") as f:
+    with stage(stats, 'pickling'), open(compressed_filename, "wb") as f:
         pickle.dump(data, f)
     return compressed_filename
 
+def with_dictionary_id(data, dictionary):
+    """Tags compressed data with the id of the dictionary it needs"""
+    return (dictionary['id'], data) if dictionary else data
+
+def load_compressed_file(path, dictionary, stats=None):
+    """Loads pickled compressed data, checking the dictionary it was tagged with"""
+    with stage(stats, 'unpickling'), open(path, "rb") as f:
+        data = safe_load(f)
+    if isinstance(data, tuple):
+        if len(data) != 2 or not isinstance(data[0], int):
+            raise CorruptDataError("Invalid dictionary tag")
+        check_dictionary(data[0], dictionary)
+        data = data[1]
+    return data
+
 def save_decompressed_file(data, algorithm, original_filename, original_extension):
     """Saves the decompressed data to a file with the original extension"""
     decompressed_filename = f"{original_filename}_{algorithm}_decompressed{original_extension}"
@@ -43,51 +55,135 @@ def save_decompressed_file(data, algorithm, original_filename, original_extensio
         f.write(data)
     return decompressed_filename
 
+def is_lzw_stream(path):
+    """Checks whether the file was written by the streaming LZW encoder"""
+    from algorithms.lzw import STREAM_MAGIC
+    with open(path, "rb") as f:
+        return f.read(len(STREAM_MAGIC)) == STREAM_MAGIC
+
+def compress(algorithm, filepath, data, dictionary=None, stats=None, level=DEFAULT_LEVEL,
+             long_range=False, entropy="huffman", order=0, stream=False):
+    """Compresses the file and returns the path of the compressed file"""
+    original_filename = os.path.splitext(os.path.basename(filepath))[0]
+    codec = load_codec(algorithm)
+    if algorithm == "lzw" and stream:
+        compressed_path = compressed_path_for(filepath, algorithm)
+        with stage(stats, 'lzw'), open(filepath, "rb") as source, open(compressed_path, "wb") as target:
+            codec.compress_stream(source, target, dictionary, stats=stats)
+        return compressed_path
+    if algorithm == "huffman":
+        return codec.compress_file(filepath, dictionary, stats, entropy, order)
+    if algorithm == "deflate":
+        compressed_path = compressed_path_for(filepath, algorithm)
+        parts = codec.deflate_parts(data, dictionary=dictionary, stats=stats, level=level,
+                              long_range=long_range, entropy=entropy, order=order)
+        with stage(stats, 'writing'):
+            write_parts(compressed_path, parts)
+        return compressed_path
+    with stage(stats, algorithm):
+        if algorithm == "lzw":
+            compressed_data = codec.lzw_encode(data, dictionary['phrases'] if dictionary else None, stats)
+        else:
+            window_size, match_finder = LZ77_LEVELS[level]
+            compressed_data = codec.lz77_compress(data, window_size,
+                                                  dictionary['content'] if dictionary else b"",
+                                                  stats, match_finder)
+    return save_compressed_file(with_dictionary_id(compressed_data, dictionary), \
+                                algorithm, original_filename, stats)
+
+def decompress(algorithm, compressed_path, filepath, dictionary=None, stats=None):
+    """Decompresses the compressed file and returns the path of the restored file"""
+    codec = load_codec(algorithm)
+    if algorithm == "huffman":
+        return codec.decompress_file(compressed_path, dictionary, stats)
+    original_filename = os.path.splitext(os.path.basename(filepath))[0]
+    original_extension = os.path.splitext(filepath)[1]
+    if algorithm == "deflate":
+        decompressed_data = codec.inflate_bit_decompress(map_file(compressed_path), dictionary=dictionary,
+                                                         stats=stats)
+    elif algorithm == "lzw" and is_lzw_stream(compressed_path):
+        decompressed_path = f"{original_filename}_lzw_decompressed{original_extension}"
+        with stage(stats, 'lzw'), open(compressed_path, "rb") as source, open(decompressed_path, "wb") as target:
+            codec.decompress_stream(source, target, dictionary, stats=stats)
+        return decompressed_path
+    elif algorithm == "lzw":
+        compressed_data = load_compressed_file(compressed_path, dictionary, stats)
+        with stage(stats, 'lzw'):
+            decompressed_data = codec.lzw_decode(compressed_data, \
+                                                 dictionary['phrases'] if dictionary else None, stats)
+    else:
+        compressed_data = load_compressed_file(compressed_path, dictionary, stats)
+        with stage(stats, 'lz77'):
+            decompressed_data = codec.lz77_decompress(compressed_data, \
+                                                      dictionary['content'] if dictionary else b"")
+    with stage(stats, 'writing'):
+        return save_decompressed_file(decompressed_data, algorithm, original_filename, original_extension)
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(description="Compress files using different algorithms.")
     parser.add_argument("filepath", help="Path to the input file")
-    parser.add_argument("algorithm", choices=["huffman", "deflate", "lzw", "lz77"], \
+    parser.add_argument("algorithm", choices=ALGORITHMS + ["auto"], \
                         help="Compression algorithm to use")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="ratio", \
+                        help="What 'auto' optimizes: ratio, speed or ratio under --time-budget")
+    parser.add_argument("--time-budget", type=float, default=None, \
+                        help="Seconds allowed for compression with '--objective budget'")
+    parser.add_argument("--dictionary", default=None, \
+                        help="Trained dictionary file (see algorithms/dictionary.py)")
+    parser.add_argument("--cache", action="store_true", \
+                        help="Reuse compressed output of identical inputs")
+    parser.add_argument("--cache-dir", default=None, \
+                        help="Directory of the compression cache (default: ~/.cache/apexconvert)")
+    parser.add_argument("--cache-size", type=int, default=256, \
+                        help="Maximum size of the compression cache in MB")
+    parser.add_argument("--level", type=int, choices=sorted(LEVELS), default=DEFAULT_LEVEL, \
+                        help="Deflate/lz77 level; 3+ use a 1 MiB window, 4 adds slow optimal parsing")
+    parser.add_argument("--long", action="store_true", \
+                        help="Deflate: also find long repeats at any distance (large inputs)")
+    parser.add_argument("--entropy", choices=ENTROPY_CODERS, default="huffman", \
+                        help="Entropy stage of huffman/deflate: Huffman codes or adaptive range coder")
+    parser.add_argument("--order", type=int, choices=ORDERS, default=0, \
+                        help="Context order of the range coder")
+    parser.add_argument("--stream", action="store_true", \
+                        help="LZW: compress in chunks with bounded memory instead of loading the whole file")
+    parser.add_argument("--stats", action="store_true", \
+                        help="Print per-stage timings and counters")
+    parser.add_argument("--profile", action="store_true", \
+                        help="Run compression and decompression under cProfile")
     args = parser.parse_args()
-    original_filename = os.path.splitext(os.path.basename(args.filepath))[0]
-    original_extension = os.path.splitext(args.filepath)[1]
+    if args.objective == "budget" and args.time_budget is None:
+        parser.error("--objective budget requires --time-budget")
+    if args.stream and args.algorithm != "lzw":
+        parser.error("--stream is only supported by lzw")
 
     original_size = get_file_size(args.filepath)
     data = readfile(args.filepath)
-
-    if args.algorithm == "huffman":
-        compressed_path = huffman_compress(args.filepath)
-        decompressed_path = huffman_decompress(compressed_path)
-
-    elif args.algorithm == "deflate":
-        compressed_data = deflate_compress(args.filepath)
-        compressed_filename = f"{original_filename}_deflate_compressed.bin"
-        with open(compressed_filename, "wb") as f:
-            f.write(compressed_data)
-        compressed_path = compressed_filename
-
-        decompressed_data = deflate_decompress(compressed_data)
-        decompressed_filename = f"{original_filename}_deflate_decompressed{original_extension}"
-        with open(decompressed_filename, "wb") as f:
-            f.write(decompressed_data)
-        decompressed_path = decompressed_filename
-
-    elif args.algorithm == "lzw":
-        compressed_data = lzw_compress(data)
-        compressed_path = save_compressed_file(compressed_data, 'lzw', original_filename)
-        decompressed_data = lzw_decompress(compressed_data)
-        decompressed_path = save_decompressed_file(decompressed_data, 'lzw', original_filename, original_extension)
-
-    elif args.algorithm == "lz77":
-        compressed_data = lz77_compress(data)
-        compressed_path = save_compressed_file(compressed_data, 'lz77', original_filename)
-        decompressed_data = lz77_decompress(compressed_data)
-        decompressed_path = save_decompressed_file(decompressed_data, 'lz77', original_filename, original_extension)
-
-    else:
-        print('Invalid algorithm')
-        return
+    dictionary = load_dictionary(args.dictionary) if args.dictionary else None
+
+    if args.algorithm == "auto":
+        args.algorithm = choose_algorithm(data, args.objective, args.time_budget)
+        print(f"Chosen algorithm       : {args.algorithm}")
+
+    compress_stats = CodecStats(args.algorithm) if args.stats else None
+    decompress_stats = CodecStats(args.algorithm, "decompress") if args.stats else None
+    with profiled(args.profile):
+        if args.cache:
+            from algorithms.cache import CompressionCache, DEFAULT_CACHE_DIR, cache_variant
+            cache = CompressionCache(args.cache_dir or DEFAULT_CACHE_DIR, args.cache_size * 1024 * 1024)
+            variant = cache_variant(args.algorithm, args.filepath, args.level, args.long,
+                                    args.entropy, args.order, args.stream)
+            compressed_path, hit = cache.compress(
+                data, args.algorithm, compressed_path_for(args.filepath, args.algorithm),
+                lambda: compress(args.algorithm, args.filepath, data, dictionary, compress_stats, args.level,
+                                 args.long, args.entropy, args.order, args.stream),
+                variant, dictionary['id'] if dictionary else None)
+            print(f"Cache                  : {'hit' if hit else 'miss'}")
+        else:
+            compressed_path = compress(args.algorithm, args.filepath, data, dictionary, compress_stats,
+                                       args.level, args.long, args.entropy, args.order, args.stream)
+        decompressed_path = decompress(args.algorithm, compressed_path, args.filepath, dictionary,
+                                       decompress_stats)
 
     compressed_size = get_file_size(compressed_path)
     compression_ratio = calc_compression_ratio(original_size, compressed_size)
@@ -97,6 +193,9 @@ def main():
     print(f"Compressed file size   : {compressed_size} bytes")
     print(f"Compression ratio      : {compression_ratio}")
     print(f"Lossless compression?  : {'Yes' if is_lossless else 'No'}")
+    if args.stats:
+        print(compress_stats.report())
+        print(decompress_stats.report())
 
 if __name__ == "__main__":
     main()
@@ -1,24 +1,20 @@
 import os
 import pickle
+import time
 import tkinter
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
-from PIL import Image, ImageTk, ImageFilter
-import math
-from algorithms.huffman import compress_file as huffman_compress, decompress_file as huffman_decompress
-from algorithms.deflate import deflate_bit_compress as deflate_compress, \
-    inflate_bit_decompress as deflate_decompress
-from algorithms.lzw import lzw_encode as lzw_compress, lzw_decode as lzw_decompress
-from algorithms.lz77 import lz77_compress, lz77_decompress
+from algorithms.registry import load_codec
+from algorithms.errors import safe_load
+from algorithms.auto import choose_algorithm, algorithm_from_filename, OBJECTIVES
+from algorithms.fileio import map_file, write_parts, compressed_path_for
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("dark-blue")
 
 def readfile(path):
-    """Read the file content"""
-    with open(path, "rb") as f:
-        data = f.read()
-    return data
+    """Map the file content into memory without copying it"""
+    return map_file(path)
 
 
 def get_file_size(path):
@@ -33,8 +29,7 @@ def calc_compression_ratio(original_size, compressed_size):
 
 def check_lossless(original_path, decompressed_path):
     """Check if the decompression is lossless"""
-    with open(original_path, 'rb') as f1, open(decompressed_path, 'rb') as f2:
-        return f1.read() == f2.read()
+    return map_file(original_path) == map_file(decompressed_path)
 
 
 def save_compressed_file(data, algorithm, original_filepath):
@@ -56,6 +51,14 @@ def save_decompressed_file(data, algorithm, original_filepath):
     return decompressed_filename
 
 
+def format_size(size):
+    """Human readable size in bytes"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
 class CircularGradient(ctk.CTkFrame):
     def __init__(self, master, width=300, height=300, color1="#FF4D00", color2="#0D0D0D", blur_radius=20, **kwargs):
         super().__init__(master, width=width, height=height, fg_color="transparent", **kwargs)
@@ -114,9 +117,18 @@ class FileConverterApp(ctk.CTk):
         self.file_path = tkinter.StringVar()
         self.algorithm = tkinter.StringVar(value="huffman")
         self.mode = tkinter.StringVar(value="compress")
+        self.objective = tkinter.StringVar(value="ratio")
+        self.time_budget = tkinter.StringVar(value="")
+        self.use_cache = tkinter.BooleanVar(value=False)
+        self.cache = None
         self.total_files = tkinter.StringVar(value="0")
         self.ratio = tkinter.StringVar(value="0.0x")
         self.total_saved = tkinter.StringVar(value="0.0 KB")
+        self.bytes_processed = 0
+        self.bytes_processed_text = tkinter.StringVar(value="0 B")
+        self.speed = tkinter.StringVar(value="0.00 MB/s")
+        self.compare_pool = None
+        self.compare_futures = []
 
         self.create_background()
 
@@ -234,7 +246,7 @@ class FileConverterApp(ctk.CTk):
 
         self.size_label = ctk.CTkLabel(
             self.stats_frame,
-            text="3.2b",
+            textvariable=self.bytes_processed_text,
             font=ctk.CTkFont(size=20, weight="bold")
         )
         self.size_label.grid(row=0, column=1, sticky="w", padx=10)
@@ -249,14 +261,14 @@ class FileConverterApp(ctk.CTk):
 
         self.awards_label = ctk.CTkLabel(
             self.stats_frame,
-            text="1k+",
+            textvariable=self.speed,
             font=ctk.CTkFont(size=20, weight="bold")
         )
         self.awards_label.grid(row=0, column=2, sticky="e", padx=10)
 
         self.awards_desc = ctk.CTkLabel(
             self.stats_frame,
-            text="Happy users",
+            text="Compression speed",
             text_color=("gray70", "gray30"),
             font=ctk.CTkFont(size=12)
         )
@@ -344,7 +356,7 @@ class FileConverterApp(ctk.CTk):
 
         self.algo_menu = ctk.CTkOptionMenu(
             self.settings_card,
-            values=["huffman", "deflate", "lzw", "lz77"],
+            values=["huffman", "deflate", "lzw", "lz77", "auto"],
             variable=self.algorithm,
             width=180,
             height=35,
@@ -365,7 +377,7 @@ class FileConverterApp(ctk.CTk):
 
         self.mode_menu = ctk.CTkOptionMenu(
             self.settings_card,
-            values=["compress", "decompress"],
+            values=["compress", "decompress", "compare"],
             variable=self.mode,
             width=180,
             height=35,
@@ -377,6 +389,54 @@ class FileConverterApp(ctk.CTk):
         )
         self.mode_menu.grid(row=2, column=1, sticky="w", padx=15, pady=(0, 15))
 
+        self.objective_label = ctk.CTkLabel(
+            self.settings_card,
+            text="Auto objective:",
+            font=ctk.CTkFont(size=12)
+        )
+        self.objective_label.grid(row=3, column=0, sticky="w", padx=15, pady=(0, 5))
+
+        self.objective_menu = ctk.CTkOptionMenu(
+            self.settings_card,
+            values=OBJECTIVES,
+            variable=self.objective,
+            width=180,
+            height=35,
+            fg_color="#171717",
+            button_color="#FF4D00",
+            button_hover_color="#FF6A29",
+            font=ctk.CTkFont(size=12),
+            corner_radius=8
+        )
+        self.objective_menu.grid(row=4, column=0, sticky="w", padx=15, pady=(0, 15))
+
+        self.budget_label = ctk.CTkLabel(
+            self.settings_card,
+            text="Time budget (s):",
+            font=ctk.CTkFont(size=12)
+        )
+        self.budget_label.grid(row=3, column=1, sticky="w", padx=15, pady=(0, 5))
+
+        self.budget_entry = ctk.CTkEntry(
+            self.settings_card,
+            textvariable=self.time_budget,
+            placeholder_text="only for budget",
+            width=180,
+            height=35,
+            font=ctk.CTkFont(size=12)
+        )
+        self.budget_entry.grid(row=4, column=1, sticky="w", padx=15, pady=(0, 15))
+
+        self.cache_checkbox = ctk.CTkCheckBox(
+            self.settings_card,
+            text="Reuse results of identical files",
+            variable=self.use_cache,
+            fg_color="#FF4D00",
+            hover_color="#FF6A29",
+            font=ctk.CTkFont(size=12)
+        )
+        self.cache_checkbox.grid(row=5, column=0, columnspan=2, sticky="w", padx=15, pady=(0, 15))
+
         self.start_button = ctk.CTkButton(
             self.main_frame,
             text="START CONVERSION",
@@ -397,16 +457,85 @@ class FileConverterApp(ctk.CTk):
         if filename:
             self.file_path.set(filename)
 
-    def update_stats(self, original_size, compressed_size, compression_ratio):
+    def update_stats(self, original_size, compressed_size, compression_ratio, seconds):
         """Update compression statistics"""
         try:
             self.total_files.set(str(int(self.total_files.get()) + 1))
             self.total_saved.set(f"{(original_size - compressed_size) / 1024:.1f} KB")
+            self.bytes_processed += original_size
+            self.bytes_processed_text.set(format_size(self.bytes_processed))
+            self.speed.set(f"{original_size / 1e6 / max(seconds, 1e-9):.2f} MB/s")
 
             self.ratio.set(f"{compression_ratio:.1f}x")
         except:
             pass
 
+    def start_compare(self, filepath):
+        """Runs every codec on the file in worker processes; poll_compare picks up the results"""
+        from concurrent.futures import ProcessPoolExecutor
+        from algorithms.compare import benchmark_codec
+        from algorithms.registry import ALGORITHMS
+
+        self.start_button.configure(state="disabled", text="COMPARING...")
+        self.compare_pool = ProcessPoolExecutor(max_workers=len(ALGORITHMS))
+        self.compare_futures = [self.compare_pool.submit(benchmark_codec, algorithm, filepath)
+                                for algorithm in ALGORITHMS]
+        self.after(200, self.poll_compare, filepath)
+
+    def poll_compare(self, filepath):
+        """Waits for the comparison without blocking the window, then shows the dashboard"""
+        if not all(future.done() for future in self.compare_futures):
+            self.after(200, self.poll_compare, filepath)
+            return
+        from algorithms.compare import file_digest, load_history, save_history, find_regressions
+
+        self.compare_pool.shutdown()
+        self.compare_pool = None
+        self.start_button.configure(state="normal", text="START CONVERSION")
+        try:
+            results = [future.result() for future in self.compare_futures]
+        except Exception as e:
+            messagebox.showerror("Error", f"Comparison failed:\n{str(e)}")
+            return
+
+        digest = file_digest(filepath)
+        history = load_history(digest, level=results[0]['level'])
+        regressions = find_regressions(results, history)
+        save_history(filepath, digest, results)
+        self.show_dashboard(filepath, results, history)
+        if regressions:
+            messagebox.showwarning("Throughput regression", "\n".join(regressions))
+
+    def show_dashboard(self, filepath, results, history):
+        """Opens a window with the comparison charts"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from algorithms.compare import plot_dashboard
+
+        window = ctk.CTkToplevel(self)
+        window.title(f"Codec comparison: {os.path.basename(filepath)}")
+        window.geometry("900x650")
+        figure = plot_dashboard(results, history, Figure(figsize=(9, 6.5)))
+        canvas = FigureCanvasTkAgg(figure, master=window)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill="both", expand=True)
+
+    def compress_file(self, algorithm, filepath):
+        """Compresses the file and returns the path of the compressed file"""
+        codec = load_codec(algorithm)
+        if algorithm == "huffman":
+            return codec.compress_file(filepath)
+
+        if algorithm == "deflate":
+            compressed_path = compressed_path_for(filepath, algorithm)
+            write_parts(compressed_path, codec.deflate_parts(readfile(filepath)))
+            return compressed_path
+
+        data = readfile(filepath)
+        if algorithm == "lzw":
+            return save_compressed_file(codec.lzw_encode(data), 'lzw', filepath)
+        return save_compressed_file(codec.lz77_compress(data), 'lz77', filepath)
+
     def compress_decompress_file(self):
         filepath = self.file_path.get()
         algorithm = self.algorithm.get()
@@ -424,59 +553,67 @@ class FileConverterApp(ctk.CTk):
             original_filename = os.path.splitext(os.path.basename(filepath))[0]
             original_extension = os.path.splitext(filepath)[1]
 
-            if mode == "compress":
-                if algorithm == "huffman":
-                    compressed_path = huffman_compress(filepath)
-
-                elif algorithm == "deflate":
-                    compressed_data = deflate_compress(filepath)
-                    compressed_path = f"{original_filename}_deflate_compressed.bin"
-                    with open(compressed_path, "wb") as f:
-                        f.write(compressed_data)
-
-                elif algorithm == "lzw":
-                    data = readfile(filepath)
-                    compressed_data = lzw_compress(data)
-                    compressed_path = save_compressed_file(compressed_data, 'lzw', filepath)
-
-                elif algorithm == "lz77":
-                    data = readfile(filepath)
-                    compressed_data = lz77_compress(data)
-                    compressed_path = save_compressed_file(compressed_data, 'lz77', filepath)
+            if mode == "compare":
+                if self.compare_pool is None:
+                    self.start_compare(filepath)
+                return
+
+            if mode == "compress" and algorithm == "auto":
+                objective = self.objective.get()
+                time_budget = float(self.time_budget.get()) if objective == "budget" else None
+                algorithm = choose_algorithm(readfile(filepath), objective, time_budget)
+            elif mode == "decompress" and algorithm == "auto":
+                algorithm = algorithm_from_filename(filepath)
+                if algorithm is None:
+                    messagebox.showerror("Input Error", "Cannot detect the algorithm from the file name.")
+                    return
 
+            if mode == "compress":
+                start = time.perf_counter()
+                if self.use_cache.get():
+                    from algorithms.cache import CompressionCache, cache_variant
+                    if self.cache is None:
+                        self.cache = CompressionCache()
+                    compressed_path, _ = self.cache.compress(
+                        readfile(filepath), algorithm, compressed_path_for(filepath, algorithm),
+                        lambda: self.compress_file(algorithm, filepath), cache_variant(algorithm, filepath))
+                else:
+                    compressed_path = self.compress_file(algorithm, filepath)
+
+                seconds = time.perf_counter() - start
                 compressed_size = get_file_size(compressed_path)
                 compression_ratio = calc_compression_ratio(original_size, compressed_size)
 
-                self.update_stats(original_size, compressed_size, compression_ratio)
+                self.update_stats(original_size, compressed_size, compression_ratio, seconds)
 
                 messagebox.showinfo("Success",
+                                    f"Algorithm: {algorithm}\n"
                                     f"Compressed: {compressed_path}\n"
                                     f"Original size: {original_size} bytes\n"
                                     f"Compressed size: {compressed_size} bytes\n"
                                     f"Compression ratio: {compression_ratio}")
 
             elif mode == "decompress":
+                codec = load_codec(algorithm)
                 if algorithm == "huffman":
-                    decompressed_path = huffman_decompress(filepath)
+                    decompressed_path = codec.decompress_file(filepath)
 
                 elif algorithm == "deflate":
-                    with open(filepath, "rb") as f:
-                        compressed_data = f.read()
-                    decompressed_data = deflate_decompress(compressed_data)
+                    decompressed_data = codec.inflate_bit_decompress(readfile(filepath))
                     decompressed_path = f"{original_filename}_deflate_decompressed{original_extension}"
                     with open(decompressed_path, "wb") as f:
                         f.write(decompressed_data)
 
                 elif algorithm == "lzw":
                     with open(filepath, "rb") as f:
-                        compressed_data = pickle.load(f)
-                    decompressed_data = lzw_decompress(compressed_data)
+                        compressed_data = safe_load(f)
+                    decompressed_data = codec.lzw_decode(compressed_data)
                     decompressed_path = save_decompressed_file(decompressed_data, 'lzw', filepath)
 
                 elif algorithm == "lz77":
                     with open(filepath, "rb") as f:
-                        compressed_data = pickle.load(f)
-                    decompressed_data = lz77_decompress(compressed_data)
+                        compressed_data = safe_load(f)
+                    decompressed_data = codec.lz77_decompress(compressed_data)
                     decompressed_path = save_decompressed_file(decompressed_data, 'lz77', filepath)
 
                 original_file_guess = filepath.replace("_compressed.bin", "").replace(f"_{algorithm}", "")
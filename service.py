@@ -0,0 +1,269 @@
+"""asyncio compression service
+
+Serves every registered algorithm over a small HTTP/1.1 subset on localhost
+or a Unix socket:
+
+    POST /compress/<algorithm>     body: raw bytes    -> compressed bytes
+    POST /decompress/<algorithm>   body: compressed   -> original bytes
+    GET  /metrics                  per-algorithm latency/throughput as JSON
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from algorithms.errors import CorruptDataError, OutputLimitError
+from algorithms.registry import ALGORITHMS, compress_bytes, decompress_bytes
+
+OPERATIONS = {"compress": compress_bytes, "decompress": decompress_bytes}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """Error that is sent back to the client with its status code"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Metrics:
+    """Per-algorithm and per-operation counters"""
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, algorithm, operation, bytes_in, bytes_out, seconds, ok=True):
+        """Adds one finished job to the counters"""
+        entry = self.stats.setdefault(f"{operation}/{algorithm}", {
+            "requests": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0,
+            "total_seconds": 0.0, "max_seconds": 0.0,
+        })
+        entry["requests"] += 1
+        entry["errors"] += 0 if ok else 1
+        entry["bytes_in"] += bytes_in
+        entry["bytes_out"] += bytes_out
+        entry["total_seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def snapshot(self):
+        """Counters with derived average latency and throughput"""
+        result = {}
+        for name, entry in self.stats.items():
+            seconds = entry["total_seconds"]
+            result[name] = dict(entry,
+                                avg_latency_ms=1000 * seconds / entry["requests"],
+                                throughput_mb_s=entry["bytes_in"] / seconds / 1e6 if seconds else 0.0)
+        return result
+
+
+class CompressionService:
+    """Accepts requests, queues them and runs the codecs in a process pool.
+
+    A request takes one of workers + queue_size slots before its body is
+    read, so at most that many bodies are held at once. When all slots are
+    taken, a request waits up to queue_timeout seconds without reading its
+    body and then answers 503.
+    Decompression stops at max_output bytes; corrupt bodies answer 400.
+    A worker that dies (killed for memory, say) breaks the pool; the jobs
+    running in it answer 500 and the pool is replaced for the next ones.
+    """
+    def __init__(self, workers=None, queue_size=16, chunk_size=64 * 1024,
+                 max_body=256 * 1024 * 1024, queue_timeout=5.0, max_output=1024 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.slots = asyncio.Semaphore(self.workers + queue_size)
+        self.chunk_size = chunk_size
+        self.max_body = max_body
+        self.queue_timeout = queue_timeout
+        self.max_output = max_output
+        self.metrics = Metrics()
+        self.tasks = []
+
+    def start(self):
+        """Starts one queue consumer per pool worker"""
+        self.tasks = [asyncio.create_task(self.consume()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Stops the consumers and the process pool"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.pool.shutdown(cancel_futures=True)
+
+    async def consume(self):
+        """Takes jobs off the queue and runs them in the pool"""
+        loop = asyncio.get_running_loop()
+        while True:
+            operation, algorithm, body, future = await self.queue.get()
+            start = time.perf_counter()
+            job = partial(OPERATIONS[operation], algorithm, body)
+            if operation == "decompress":
+                job = partial(job, max_output=self.max_output)
+            pool = self.pool
+            try:
+                result = await loop.run_in_executor(pool, job)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool) and self.pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                self.metrics.record(algorithm, operation, len(body), 0, time.perf_counter() - start, False)
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                self.metrics.record(algorithm, operation, len(body), len(result), time.perf_counter() - start)
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self.queue.task_done()
+
+    async def submit(self, operation, algorithm, body):
+        """Queues a job and waits for its result"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self.queue.put((operation, algorithm, body, future)), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(503, "Too many requests in the queue") from None
+        return await future
+
+    async def read_body(self, reader, headers):
+        """Reads the request body in chunks, from Content-Length or chunked encoding"""
+        body = bytearray()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    await reader.readline()
+                    return bytes(body)
+                if len(body) + size > self.max_body:
+                    raise HTTPError(413, "Request body is too large")
+                body += await reader.readexactly(size)
+                await reader.readline()
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length or chunked encoding is required")
+        remaining = int(headers["content-length"])
+        if remaining > self.max_body:
+            raise HTTPError(413, "Request body is too large")
+        while remaining:
+            chunk = await reader.read(min(self.chunk_size, remaining))
+            if not chunk:
+                raise HTTPError(400, "Request body ended early")
+            body += chunk
+            remaining -= len(chunk)
+        return bytes(body)
+
+    async def send(self, writer, status, body, content_type="application/octet-stream"):
+        """Sends the response in chunks, waiting for the client to drain each one"""
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     "Transfer-Encoding: chunked\r\n"
+                     "Connection: close\r\n\r\n".encode())
+        view = memoryview(body)
+        for i in range(0, len(view), self.chunk_size):
+            chunk = view[i:i + self.chunk_size]
+            writer.writelines([f"{len(chunk):x}\r\n".encode(), chunk, b"\r\n"])
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def route(self, reader, method, path, headers):
+        """Handles one request and returns the response status and body"""
+        parts = path.strip("/").split("/")
+        if parts == ["metrics"]:
+            if method != "GET":
+                raise HTTPError(405, "Use GET")
+            return 200, json.dumps(self.metrics.snapshot(), indent=2).encode(), "application/json"
+        if len(parts) != 2 or parts[0] not in OPERATIONS:
+            raise HTTPError(404, f"Unknown path: {path}")
+        if method != "POST":
+            raise HTTPError(405, "Use POST")
+        operation, algorithm = parts
+        if algorithm not in ALGORITHMS:
+            raise HTTPError(404, f"Unknown algorithm: {algorithm}")
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(503, "Too many requests in progress") from None
+        try:
+            body = await self.read_body(reader, headers)
+            result = await self.submit(operation, algorithm, body)
+        except HTTPError:
+            raise
+        except OutputLimitError as e:
+            raise HTTPError(413, f"{operation} failed: {e}") from e
+        except CorruptDataError as e:
+            raise HTTPError(400, f"{operation} failed: {e}") from e
+        except Exception as e:
+            raise HTTPError(500, f"{operation} failed: {e}") from e
+        finally:
+            self.slots.release()
+        return 200, result, "application/octet-stream"
+
+    async def handle(self, reader, writer):
+        """Connection callback for asyncio.start_server"""
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                status, body, content_type = await self.route(reader, method, path, headers)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                status, body, content_type = 400, b"Malformed request\n", "text/plain"
+            except HTTPError as e:
+                status, body, content_type = e.status, f"{e}\n".encode(), "text/plain"
+            await self.send(writer, status, body, content_type)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args):
+    """Runs the service until it is interrupted"""
+    service = CompressionService(args.workers, args.queue_size, args.chunk_size * 1024,
+                                 args.max_body * 1024 * 1024, max_output=args.max_output * 1024 * 1024)
+    service.start()
+    if args.unix:
+        server = await asyncio.start_unix_server(service.handle, path=args.unix)
+        where = args.unix
+    else:
+        server = await asyncio.start_server(service.handle, args.host, args.port)
+        where = f"http://{args.host}:{args.port}"
+    print(f"Serving {', '.join(ALGORITHMS)} on {where} with {service.workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Local compression service.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket instead")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--queue-size", type=int, default=16, help="Maximum number of queued jobs")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Streaming chunk size in KB")
+    parser.add_argument("--max-body", type=int, default=256, help="Maximum request body in MB")
+    parser.add_argument("--max-output", type=int, default=1024, help="Maximum decompressed size in MB")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()